@@ -0,0 +1,65 @@
+import threading
+import time
+from deadline import Deadline
+
+
+class AITurn:
+    """
+    An AI choosing a move in a background thread, so that a GUI can stay responsive meanwhile. The GUI polls is_done
+    (e.g. with Tk's after) and then collects the move with get_move, on its own thread.
+    """
+    def __init__(self, ai, budget):
+        """
+        Starts ai choosing a move, with a Deadline budget seconds away. ai must not be used elsewhere, nor the board it
+        sees changed, until the turn is done.
+        """
+        self.deadline = Deadline(budget)
+        self.cancelled = False
+        self._budget = budget
+        self._start = time.monotonic()
+        self._move = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(ai,), daemon=True)
+        self._thread.start()
+
+    def _run(self, ai):
+        try:
+            self._move = ai.choose_move(self.deadline)
+        except Exception as e:
+            self._error = e  # Raised again by get_move, on the GUI's thread
+
+    def is_done(self):
+        return not self._thread.is_alive()
+
+    def move_now(self):
+        """
+        Asks the AI to make the best move it has found so far.
+        """
+        self.deadline.move_now()
+
+    def cancel(self):
+        """
+        Asks the AI to stop searching, and marks its move to be discarded. The turn is done once the AI has stopped.
+        """
+        self.cancelled = True
+        self.deadline.move_now()
+
+    def get_elapsed(self):
+        """
+        Returns the number of seconds since the turn started.
+        """
+        return time.monotonic() - self._start
+
+    def get_progress(self):
+        """
+        Returns the fraction of the budget used so far, at most 1.
+        """
+        return min(1.0, self.get_elapsed() / self._budget)
+
+    def get_move(self):
+        """
+        Returns the move the AI chose, raising whatever it raised instead, if anything. The turn must be done.
+        """
+        if self._error is not None:
+            raise self._error
+        return self._move
@@ -0,0 +1,127 @@
+from board import *
+from lexicon import *
+
+
+class AnagramIndex(Automaton):
+    """
+    Index of words by signature (their letters in sorted order). Each word is stored as its signature, then
+    SEPARATOR, then the word itself, so the words with a given signature share a path and the minimized automaton
+    stays small.
+
+    Because signatures are sorted, the words formable from a multiset of letters can be found by walking only the
+    signatures that are sub-multisets of it, never touching the rest of the dictionary.
+    """
+    @staticmethod
+    def strings(words):
+        for word in words:
+            yield ''.join(sorted(word)) + SEPARATOR + word
+
+    def words(self, letters):
+        """
+        Returns a list of the words that can be formed from letters, where each _ is a blank that can stand for any
+        letter. Other characters (such as upper-case played blanks) are ignored.
+        """
+        counts = [0] * 26
+        blanks = 0
+        for letter in letters:
+            if letter == '_':
+                blanks += 1
+            elif 'a' <= letter <= 'z':
+                counts[LETTER_INDEX[letter]] += 1
+        result = []
+        self._add_anagrams(self.root, counts, blanks, result)
+        return result
+
+    def has_anagram(self, letters):
+        """
+        Returns true if some word uses exactly the letters in letters, where each _ is a blank that can stand for any
+        letter.
+        """
+        counts = [0] * 26
+        blanks = 0
+        for letter in letters:
+            if letter == '_':
+                blanks += 1
+            else:
+                counts[LETTER_INDEX[letter]] += 1
+        return self._has_anagram(self.root, counts, 0, blanks)
+
+    def _has_anagram(self, node, counts, i, blanks):
+        """
+        Returns true if the signature can be completed from node using exactly the letters in counts (none of them
+        before letter index i, since signatures are sorted) and blanks.
+        """
+        while i < 26 and not counts[i]:
+            i += 1
+        if i == 26 and not blanks:
+            return bool(self.child(node, SEPARATOR_INDEX))
+        if i < 26:
+            next_node = self.child(node, i)
+            if next_node:
+                counts[i] -= 1
+                found = self._has_anagram(next_node, counts, i, blanks)
+                counts[i] += 1
+                if found:
+                    return True
+        if blanks:
+            # The blank stands for some letter no later than the next one needed
+            mask = self.letters(node) & ((1 << min(i + 1, 26)) - 1)
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                j = bit.bit_length() - 1
+                if self._has_anagram(self.child(node, j), counts, j, blanks - 1):
+                    return True
+        return False
+
+    def _add_anagrams(self, node, counts, blanks, result):
+        """
+        Appends to result every word whose signature continues from node using only the letters in counts and
+        blanks.
+        """
+        separated = self.child(node, SEPARATOR_INDEX)
+        if separated:
+            self._add_words(separated, result)
+        mask = self.letters(node)
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            i = bit.bit_length() - 1
+            if counts[i]:
+                counts[i] -= 1
+                self._add_anagrams(self.child(node, i), counts, blanks, result)
+                counts[i] += 1
+            elif blanks:
+                self._add_anagrams(self.child(node, i), counts, blanks - 1, result)
+
+    def _add_words(self, node, result):
+        """
+        Appends to result every word stored after SEPARATOR, starting from node.
+        """
+        stack = [(node, '')]
+        while stack:
+            node, prefix = stack.pop()
+            if self.is_final(node):
+                result.append(prefix)
+            mask = self.letters(node)
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                i = bit.bit_length() - 1
+                stack.append((self.child(node, i), prefix + SYMBOLS[i]))
+
+
+# Compiled anagram index, built from words.txt the first time it is needed (or by running lexicon.py)
+ANAGRAMS_PATH = os.path.join(current_dir, 'words.anagrams')
+
+_anagram_index = None
+
+
+def get_anagram_index():
+    """
+    Returns the AnagramIndex for DICTIONARY, loading it the first time it is needed.
+    """
+    global _anagram_index
+    if _anagram_index is None:
+        _anagram_index = AnagramIndex.load(WORDS_PATH, ANAGRAMS_PATH)
+    return _anagram_index
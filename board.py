@@ -1,6 +1,9 @@
+import copy
 import random
 import os
-from location import CENTER
+import string
+from location import WIDTH, CENTER, SQUARES, OFF_BOARD, axis, NEXT, PREVIOUS
+from lexicon import Lexicon, ALL_LETTERS, LETTER_INDEX
 
 # Constants about the board representation
 DOUBLE_LETTER_SCORE = '-'
@@ -46,10 +49,78 @@ def set_tile_values():
 set_tile_values()
 
 
-# The dictionary of legal words
+# Every tile in the game, which is what the bag holds before any are dealt
+FULL_BAG = 'aaaaaaaaabbccddddeeeeeeeeeeeeffggghhiiiiiiiiijkllllmmnnnnnnooooooooppqrrrrrrssssttttttuuuuvvwwxyyz__'
+
+
+# Failure codes returned by Board.evaluate instead of a score, and the messages verify_legality raises for them
+TOO_SHORT = -1
+NO_NEW_TILES = -2
+NOT_IN_HAND = -3
+BAD_PLACEMENT = -4
+INVALID_WORD = -5
+FAILURE_MESSAGES = {TOO_SHORT: 'Word must be at least two letters long.',
+                    NO_NEW_TILES: 'Word must contain at least one new tile.',
+                    NOT_IN_HAND: 'Hand does not contains sufficient tiles to play word.',
+                    BAD_PLACEMENT: 'Board placement incorrect (gaps, overlapping tiles, edge of board).',
+                    INVALID_WORD: 'Invalid word created.'}
+
+
+# Random 64-bit keys for Zobrist hashing (Zobrist, 1970): a position's hash is the XOR of the keys of its features,
+# so it can be updated incrementally as tiles come and go. SQUARE_KEYS[i][tile] is for tile (upper-case for a played
+# blank) on square i, RACK_KEYS[tile][n] for having more than n of tile in a rack, and SIDE_KEY for player 1 to move.
+SQUARE_KEYS = []
+RACK_KEYS = {}
+SIDE_KEY = 0
+
+
+def set_zobrist_keys():
+    global SIDE_KEY
+    generator = random.Random(0)  # Fixed seed, so hashes agree between runs and processes
+    for i in range(WIDTH * WIDTH):
+        SQUARE_KEYS.append({tile: generator.getrandbits(64) for tile in string.ascii_letters})
+    for tile in string.ascii_lowercase + '_':
+        RACK_KEYS[tile] = [generator.getrandbits(64) for _ in range(7)]
+    SIDE_KEY = generator.getrandbits(64)
+set_zobrist_keys()
+
+
+def hash_rack(hand):
+    """
+    Returns the Zobrist hash of the tiles in hand, which does not depend on their order.
+    """
+    result = 0
+    counts = {}
+    for tile in hand:
+        n = counts.get(tile, 0)
+        result ^= RACK_KEYS[tile][n]
+        counts[tile] = n + 1
+    return result
+
+
+# The dictionary of legal words, compiled from words.txt the first time it is needed (or by running lexicon.py)
 current_dir = os.path.dirname(__file__)  # Current working directory, necessary for this to run when imported into a test
-with open(os.path.join(current_dir, 'words.txt')) as file:
-    DICTIONARY = set(word.strip() for word in file)
+WORDS_PATH = os.path.join(current_dir, 'words.txt')
+LEXICON_PATH = os.path.join(current_dir, 'words.dawg')
+DICTIONARY = Lexicon.load(WORDS_PATH, LEXICON_PATH)
+
+
+class Change:
+    """
+    Record of what Board.apply_play or Board.apply_exchange changed, so that Board.undo can restore the previous
+    state exactly without the board having been copied.
+    """
+    __slots__ = ('hand', 'old_hand', 'placed', 'drawn', 'old_bag', 'old_scores', 'old_player', 'old_passes')
+
+    def __init__(self, board, hand):
+        self.hand = hand
+        self.old_hand = hand[:]
+        self.placed = []  # Indices of the squares where tiles were placed
+        self.drawn = 0  # Number of tiles drawn from the end of the bag
+        self.old_bag = None  # Contents of the bag, if it was shuffled
+        self.old_scores = board._scores[:]
+        self.old_player = board._current_player
+        self.old_passes = board._number_of_passes
 
 
 class Board:
@@ -63,8 +134,8 @@ class Board:
     Words submitted consist of letters (upper-case for played blanks) and spaces (existing tiles on the board).
     """
     def __init__(self):
-        self._squares = [[square for square in row] for row in LAYOUT]
-        self._bag = list('aaaaaaaaabbccddddeeeeeeeeeeeeffggghhiiiiiiiiijkllllmmnnnnnnooooooooppqrrrrrrssssttttttuuuuvvwwxyyz__')
+        self._squares = list(''.join(LAYOUT)) + [NO_PREMIUM]  # Indexed by square (see location.SQUARES)
+        self._bag = list(FULL_BAG)
         random.shuffle(self._bag)
         self._hands = [[], []]
         self._deal(self._hands[0], 7)
@@ -73,6 +144,39 @@ class Board:
         self._current_player = 0
         self._number_of_passes = 0
         self._last_move = None
+        # For each direction (see axis) and empty square, the letters that could be played there without forming an
+        # illegal word in that direction, as a bit mask (bit 0 for a, bit 1 for b, etc.), and the total value of the
+        # tiles already on the board that score_cross_word counts for that word, or None if it scores nothing. Kept up
+        # to date by place_word.
+        self._cross_checks = [[ALL_LETTERS] * (OFF_BOARD + 1) for _ in range(2)]
+        self._cross_sums = [[None] * (OFF_BOARD + 1) for _ in range(2)]
+        for i in range(OFF_BOARD):
+            for a in range(2):
+                self._compute_cross_check(i, a)
+        # Indices of the empty squares where a move could connect to the tiles on the board: those next to a tile, or
+        # the center if the board is empty. Kept up to date by place_word.
+        self._anchors = {CENTER.index()}
+        # Zobrist hash (see SQUARE_KEYS) of the tiles on the board and the player to move
+        self._hash = 0
+        # Number of each tile (_ for a blank) not yet on the board, in the bag or either hand. Kept up to date by
+        # place_word.
+        self._unplayed = self._count_tiles(FULL_BAG)
+
+    def copy(self):
+        """
+        Returns a copy of this board whose state (including the bag and hands) can be changed without affecting this
+        one.
+        """
+        result = copy.copy(self)
+        result._squares = self._squares[:]
+        result._bag = self._bag[:]
+        result._hands = [hand[:] for hand in self._hands]
+        result._scores = self._scores[:]
+        result._cross_checks = [checks[:] for checks in self._cross_checks]
+        result._cross_sums = [sums[:] for sums in self._cross_sums]
+        result._anchors = set(self._anchors)
+        result._unplayed = self._unplayed.copy()
+        return result
 
     def _deal(self, hand, n):
         """
@@ -84,7 +188,7 @@ class Board:
             hand.append(self._bag.pop())
 
     def __str__(self):
-        return '\n'.join(''.join(row) for row in self._squares)
+        return '\n'.join(''.join(self._squares[r * WIDTH:(r + 1) * WIDTH]) for r in range(WIDTH))
 
     def __repr__(self):
         return self.__str__()
@@ -113,17 +217,18 @@ class Board:
         Returns true if word can be placed on board, in the sence of not overlapping existing tiles, leaving no gaps,
         having no tiles right before or after it, and not extending beyond the edge of the board.
         """
-        before = location - direction
-        if before.is_on_board() and self.is_occupied(before):
+        squares = self._squares
+        i = location.index()
+        step = NEXT[axis(direction)]
+        if squares[PREVIOUS[axis(direction)][i]].isalpha():
             return False  # Tile right before word starts
         for letter in word:
-            if not location.is_on_board():
+            if i == OFF_BOARD:
                 return False  # Off edge of board
-            current = self.get_square(location)
-            if (letter == ' ') != current.isalpha():
+            if (letter == ' ') != squares[i].isalpha():
                 return False  # Tile played on top of existing tile, or gap in word where there is no tile
-            location += direction
-        if location.is_on_board() and self.is_occupied(location):
+            i = step[i]
+        if squares[i].isalpha():
             return False  # Tile right after word ends
         return True
 
@@ -133,6 +238,24 @@ class Board:
         """
         return self._scores
 
+    def set_bag(self, tiles):
+        """
+        Replaces the contents of the bag with tiles. The last tile is drawn first.
+        """
+        self._bag = list(tiles)
+
+    def get_current_player(self):
+        """
+        Returns the number of the player to move.
+        """
+        return self._current_player
+
+    def get_number_of_passes(self):
+        """
+        Returns the number of consecutive moves, just made, that placed no tiles. The game ends when it reaches 2.
+        """
+        return self._number_of_passes
+
     def get_bag_count(self):
         """
         Returns the number of tiles left in the bag.
@@ -140,7 +263,7 @@ class Board:
         return len(self._bag)
 
     def get_square(self, location):
-        return self._squares[location.r][location.c]
+        return self._squares[location.r * WIDTH + location.c]
 
     def set_last_move(self, move):
         self._last_move = move
@@ -152,29 +275,172 @@ class Board:
         return self.get_square(location).isalpha()
 
     def _set_square(self, tile, location):
-        self._squares[location.r][location.c] = tile
+        self._squares[location.r * WIDTH + location.c] = tile
 
     def place_word(self, word, location, direction):
+        """
+        Puts the tiles in word on the board. Returns the list of indices of the squares where tiles were placed.
+        """
+        i = location.index()
+        step = NEXT[axis(direction)]
+        placed = []
         for letter in word:
             if letter != ' ':
-                self._set_square(letter, location)
-            location += direction
+                self._squares[i] = letter
+                self._hash ^= SQUARE_KEYS[i][letter]
+                self._unplayed['_' if letter.isupper() else letter] -= 1
+                placed.append(i)
+            i = step[i]
+        for i in placed:
+            self._update_cross_checks(i)
+            self._update_anchors(i)
+        return placed
+
+    def _remove_tiles_from_board(self, placed):
+        """
+        Takes the tiles at the squares with indices in placed off the board, undoing place_word.
+        """
+        for i in placed:
+            self._hash ^= SQUARE_KEYS[i][self._squares[i]]
+            self._unplayed['_' if self._squares[i].isupper() else self._squares[i]] += 1
+            self._squares[i] = LAYOUT[i // WIDTH][i % WIDTH]
+        for i in placed:
+            for a in range(2):
+                self._compute_cross_check(i, a)
+            self._update_cross_checks(i)
+            self._compute_anchor(i)
+            for a in range(2):
+                for neighbor in PREVIOUS[a][i], NEXT[a][i]:
+                    if neighbor != OFF_BOARD:
+                        self._compute_anchor(neighbor)
+
+    def _update_cross_checks(self, i):
+        """
+        Recomputes the cross-check information (see __init__) that may have been changed by placing a tile at (or
+        removing one from) square i: that of the empty squares just before and after the run of tiles next to it, in
+        each direction.
+        """
+        squares = self._squares
+        for a in range(2):
+            before = PREVIOUS[a][i]
+            while squares[before].isalpha():
+                before = PREVIOUS[a][before]
+            after = NEXT[a][i]
+            while squares[after].isalpha():
+                after = NEXT[a][after]
+            for square in before, after:
+                if square != OFF_BOARD:
+                    self._compute_cross_check(square, a)
+
+    def _compute_cross_check(self, i, a):
+        """
+        Computes the cross-check information (see __init__) for the empty square i and words along axis a.
+        """
+        squares = self._squares
+        before = ''
+        total = 0
+        current = PREVIOUS[a][i]
+        while squares[current].isalpha():
+            before = squares[current] + before
+            total += TILE_VALUES[squares[current]]
+            current = PREVIOUS[a][current]
+        after = ''
+        current = NEXT[a][i]
+        while squares[current].isalpha():
+            after += squares[current]
+            total += TILE_VALUES[squares[current]]
+            current = NEXT[a][current]
+        if before or after:
+            self._cross_checks[a][i] = DICTIONARY.cross_check(before.lower(), after.lower())
+        else:
+            self._cross_checks[a][i] = ALL_LETTERS
+        # These cases score nothing, as when cross words were scored by walking the board: a cross word with exactly
+        # one tile before location, or no cross word at all (unless location is at the far edge of the board, where
+        # the tile is scored alone)
+        if len(before) == 1 or not (before or after) and NEXT[a][i] != OFF_BOARD:
+            self._cross_sums[a][i] = None
+        else:
+            self._cross_sums[a][i] = total
+
+    def _update_anchors(self, i):
+        """
+        Updates the anchors (see __init__) after a tile has been placed at square i.
+        """
+        squares = self._squares
+        self._anchors.discard(i)
+        center = CENTER.index()
+        if not squares[center].isalpha():
+            self._anchors.discard(center)  # No longer the only way to connect
+        for a in range(2):
+            for neighbor in PREVIOUS[a][i], NEXT[a][i]:
+                if neighbor != OFF_BOARD and not squares[neighbor].isalpha():
+                    self._anchors.add(neighbor)
+
+    def _compute_anchor(self, i):
+        """
+        Adds square i to the anchors (see __init__) or discards it from them, according to the tiles now on the board.
+        Because the first move covers the center, the center is empty only when the whole board is.
+        """
+        squares = self._squares
+        if squares[i].isalpha():
+            self._anchors.discard(i)
+        elif i == CENTER.index() or any(squares[PREVIOUS[a][i]].isalpha() or squares[NEXT[a][i]].isalpha()
+                                        for a in range(2)):
+            self._anchors.add(i)
+        else:
+            self._anchors.discard(i)
+
+    def get_hash(self, hand=None):
+        """
+        Returns a 64-bit Zobrist hash of the tiles on the board and the player to move, combined with that of the
+        tiles in hand if it is given. Equal positions always have equal hashes; different ones almost never do.
+        """
+        if hand is None:
+            return self._hash
+        return self._hash ^ hash_rack(hand)
+
+    def get_unseen(self, player_number):
+        """
+        Returns a dict of the number of each tile (_ for a blank) that the given player can't see: those in the bag or
+        the opponent's hand.
+        """
+        unseen = self._unplayed.copy()
+        for tile in self._hands[player_number]:
+            unseen[tile] -= 1
+        return unseen
+
+    def get_anchors(self):
+        """
+        Returns the set of indices (see location.SQUARES) of the anchor squares (see __init__). The caller must not
+        modify it.
+        """
+        return self._anchors
+
+    def get_cross_check(self, location, direction):
+        """
+        Returns a bit mask (bit 0 for a, bit 1 for b, etc.) of the letters that could be played at the empty square
+        location without forming an illegal word in direction.
+        """
+        return self._cross_checks[axis(direction)][location.index()]
 
     def would_be_connected(self, word, location, direction):
         """
         Returns True if word, placed at location in direction, would be connected. In other words, word must contain
         an existing tile, be beside an existing tile, or contain the center.
         """
-        cross = direction.orthogonal()
+        squares = self._squares
+        i = location.index()
+        step = NEXT[axis(direction)]
+        cross = axis(direction.orthogonal())
+        center = CENTER.index()
         for letter in word:
             if letter == '':
                 return True  # Contains a played tile
-            if location == CENTER:
+            if i == center:
                 return True  # Contains center
-            for neighbor in location + cross, location - cross:
-                if neighbor.is_on_board() and self.is_occupied(neighbor):
-                    return True  # Letter next to word on one side
-            location += direction
+            if squares[PREVIOUS[cross][i]].isalpha() or squares[NEXT[cross][i]].isalpha():
+                return True  # Letter next to word on one side
+            i = step[i]
         return False
 
     def is_valid_word(self, word, location, direction):
@@ -183,13 +449,16 @@ class Board:
         """
         if len(word) < 2:
             return False
+        squares = self._squares
+        i = location.index()
+        step = NEXT[axis(direction)]
         letters = ''
         for letter in word:
-            if self.is_occupied(location):
-                letters += self.get_square(location)
+            if squares[i].isalpha():
+                letters += squares[i]
             else:
                 letters += letter
-            location += direction
+            i = step[i]
         return letters.lower() in DICTIONARY
 
     def is_valid_cross_word(self, tile, location, direction):
@@ -198,21 +467,7 @@ class Board:
         """
         if tile == ' ':
             return True  # Word was already on board
-        location = self.find_start_of_word(location, direction)
-        word = ''
-        tile_used = False
-        while location.is_on_board():
-            if self.is_occupied(location):
-                word += self.get_square(location)
-            elif tile_used:
-                break  # Reached end of cross word
-            else:
-                word += tile
-                tile_used = True
-            location += direction
-        if len(word) == 1:
-            return True  # No cross word here
-        return word.lower() in DICTIONARY
+        return bool(self.get_cross_check(location, direction) & (1 << LETTER_INDEX[tile.lower()]))
 
     def would_create_only_legal_words(self, word, location, direction):
         """
@@ -220,62 +475,63 @@ class Board:
         """
         if not self.is_valid_word(word, location, direction):
             return False
-        cross = direction.orthogonal()
+        i = location.index()
+        step = NEXT[axis(direction)]
+        cross_checks = self._cross_checks[axis(direction.orthogonal())]
         for letter in word:
-            if not self.is_valid_cross_word(letter, location, cross):
+            if letter != ' ' and not cross_checks[i] & (1 << LETTER_INDEX[letter.lower()]):
                 return False
-            location += direction
+            i = step[i]
         return True
 
     def find_start_of_word(self, location, direction):
         """
         Returns the location of the first tile in a (cross) word that includes location and moves in direction.
         """
-        while True:
-            location -= direction
-            if not (location.is_on_board() and self.is_occupied(location)):
-                return location + direction
+        i = location.index()
+        step = PREVIOUS[axis(direction)]
+        while self._squares[step[i]].isalpha():
+            i = step[i]
+        return SQUARES[i]
 
     def score_cross_word(self, tile, location, direction):
         """
         Returns the score for the cross word in direction including (but not necessarily starting with) tile played
         at location.
         """
-        score = 0
-        multiplier = 1
-        location = self.find_start_of_word(location, direction)
-        if (location + direction).is_on_board() and not self.is_occupied(location + direction):
+        return self._score_cross_word(tile, location.index(), axis(direction))
+
+    def _score_cross_word(self, tile, i, a):
+        """
+        Returns the score for the cross word along axis a including tile played at square i.
+        """
+        score = self._cross_sums[a][i]
+        if score is None:
             return 0  # One letter "cross word"
-        tile_used = False
-        while location.is_on_board():
-            square = self.get_square(location)
-            if self.is_occupied(location):
-                score += TILE_VALUES[square]
-            elif tile_used:
-                break  # End of cross word
-            else:
-                score += TILE_VALUES[tile]
-                bonus = self.get_square(location)
-                if bonus == DOUBLE_LETTER_SCORE:
-                    score += TILE_VALUES[tile]
-                elif bonus == TRIPLE_LETTER_SCORE:
-                    score += 2 * TILE_VALUES[tile]
-                elif bonus == DOUBLE_WORD_SCORE:
-                    multiplier *= 2
-                elif bonus == TRIPLE_LETTER_SCORE:
-                    multiplier *= 3
-                tile_used = True
-            location += direction
+        multiplier = 1
+        score += TILE_VALUES[tile]
+        bonus = self._squares[i]
+        if bonus == DOUBLE_LETTER_SCORE:
+            score += TILE_VALUES[tile]
+        elif bonus == TRIPLE_LETTER_SCORE:
+            score += 2 * TILE_VALUES[tile]
+        elif bonus == DOUBLE_WORD_SCORE:
+            multiplier *= 2
+        elif bonus == TRIPLE_LETTER_SCORE:
+            multiplier *= 3
         return score * multiplier
 
     def score_word(self, word, location, direction):
         """
         Returns the points score for word, played at location in direction.
         """
+        squares = self._squares
+        i = location.index()
+        step = NEXT[axis(direction)]
         score = 0
         multiplier = 1
         for tile in word:
-            square = self.get_square(location)
+            square = squares[i]
             if tile == ' ':
                 score += TILE_VALUES[square]
             else:
@@ -288,7 +544,7 @@ class Board:
                     multiplier *= 2
                 elif square == TRIPLE_WORD_SCORE:
                     multiplier *= 3
-            location += direction
+            i = step[i]
         return score * multiplier
 
     def score(self, word, location, direction):
@@ -296,12 +552,15 @@ class Board:
         Returns the score for playing word at location in direction, including any cross words.
         """
         score = self.score_word(word, location, direction)
+        i = location.index()
+        step = NEXT[axis(direction)]
+        cross = axis(direction.orthogonal())
         tiles_played = 0
         for tile in word:
             if tile != ' ':
-                score += self.score_cross_word(tile, location, direction.orthogonal())
+                score += self._score_cross_word(tile, i, cross)
                 tiles_played += 1
-            location += direction
+            i = step[i]
         if tiles_played == 7:
             score += 50
         return score
@@ -310,17 +569,109 @@ class Board:
         """
         Throws a ValueError if playing word at location in direction from hand would not be legal.
         """
+        result = self.evaluate(word, location, direction, hand)
+        if result < 0:
+            raise ValueError(FAILURE_MESSAGES[result])
+
+    def evaluate(self, word, location, direction, hand):
+        """
+        Returns the score for playing word at location in direction from hand if that is legal, or otherwise a negative
+        failure code (see FAILURE_MESSAGES). Checks legality and scores in a single walk along the word.
+        """
+        return self._evaluate(word, location, direction, self._count_tiles(hand))
+
+    def evaluate_all(self, candidates, hand):
+        """
+        Returns a list of the results of evaluate for each (word, location, direction) in candidates, played from hand.
+        """
+        counts = self._count_tiles(hand)
+        return [self._evaluate(word, location, direction, counts) for word, location, direction in candidates]
+
+    @staticmethod
+    def _count_tiles(hand):
+        """
+        Returns a dict of the number of each tile in hand.
+        """
+        counts = {}
+        for tile in hand:
+            counts[tile] = counts.get(tile, 0) + 1
+        return counts
+
+    def _evaluate(self, word, location, direction, counts):
+        """
+        Same as evaluate, with the tiles in the hand given as a dict of counts (see _count_tiles). The checks are made
+        in the same order as they were when verify_legality made them one at a time, so the same failure is reported.
+        """
         if len(word) < 2:
-            raise ValueError('Word must be at least two letters long.')
-        if all(tile == ' ' for tile in word):
-            raise ValueError('Word must contain at least one new tile.')
-        if not self.can_be_drawn_from_hand(word, hand):
-            raise ValueError('Hand does not contains sufficient tiles to play word.')
-        if not (self.can_be_placed_on_board(word, location, direction) and
-            self.would_be_connected(word, location, direction)):
-            raise ValueError('Board placement incorrect (gaps, overlapping tiles, edge of board).')
-        if not self.would_create_only_legal_words(word, location, direction):
-            raise ValueError('Invalid word created.')
+            return TOO_SHORT
+        if word.count(' ') == len(word):
+            return NO_NEW_TILES
+        needed = {}
+        for letter in word:
+            if letter != ' ':
+                tile = '_' if letter.isupper() else letter
+                needed[tile] = needed.get(tile, 0) + 1
+                if needed[tile] > counts.get(tile, 0):
+                    return NOT_IN_HAND
+        squares = self._squares
+        a = axis(direction)
+        step = NEXT[a]
+        cross = 1 - a
+        previous = PREVIOUS[cross]
+        following = NEXT[cross]
+        cross_checks = self._cross_checks[cross]
+        center = CENTER.index()
+        i = location.index()
+        if squares[PREVIOUS[a][i]].isalpha():
+            return BAD_PLACEMENT  # Tile right before word starts
+        connected = False
+        legal_cross_words = True
+        letters = ''
+        score = 0
+        multiplier = 1
+        cross_score = 0
+        tiles_played = 0
+        for letter in word:
+            if i == OFF_BOARD:
+                return BAD_PLACEMENT  # Off edge of board
+            square = squares[i]
+            if letter == ' ':
+                if not square.isalpha():
+                    return BAD_PLACEMENT  # Gap in word where there is no tile
+                letters += square
+                score += TILE_VALUES[square]
+            else:
+                if square.isalpha():
+                    return BAD_PLACEMENT  # Tile played on top of existing tile
+                letters += letter
+                score += TILE_VALUES[letter]
+                if square == DOUBLE_LETTER_SCORE:
+                    score += TILE_VALUES[letter]
+                elif square == TRIPLE_LETTER_SCORE:
+                    score += 2 * TILE_VALUES[letter]
+                elif square == DOUBLE_WORD_SCORE:
+                    multiplier *= 2
+                elif square == TRIPLE_WORD_SCORE:
+                    multiplier *= 3
+                index = LETTER_INDEX.get(letter.lower())
+                if index is None or not cross_checks[i] & (1 << index):
+                    legal_cross_words = False
+                else:
+                    cross_score += self._score_cross_word(letter, i, cross)
+                tiles_played += 1
+            if i == center or squares[previous[i]].isalpha() or squares[following[i]].isalpha():
+                connected = True
+            i = step[i]
+        if squares[i].isalpha():
+            return BAD_PLACEMENT  # Tile right after word ends
+        if not connected:
+            return BAD_PLACEMENT
+        if not legal_cross_words or letters.lower() not in DICTIONARY:
+            return INVALID_WORD
+        score = score * multiplier + cross_score
+        if tiles_played == 7:
+            score += 50
+        return score
 
     @staticmethod
     def remove_tiles(word, hand):
@@ -364,6 +715,14 @@ class Board:
         :param tiles_to_exchange: An array of seven bools indicating which tiles to exchange. Any entries beyond the
         length of hand are ignored.
         """
+        self.apply_exchange(hand, tiles_to_exchange)
+
+    def apply_exchange(self, hand, tiles_to_exchange):
+        """
+        Same as exchange, but returns a Change that can be passed to undo.
+        """
+        change = Change(self, hand)
+        change.old_bag = self._bag[:]
         removed = [tile for i, tile in enumerate(hand) if tiles_to_exchange[i]]
         dumped = self.remove_tiles(removed, hand)
         self._deal(hand, 7 - len(hand))
@@ -374,9 +733,11 @@ class Board:
         # If there weren't enough tiles in bag, some dumped tiles may return to hand
         self._deal(hand, 7 - len(hand))
         self._current_player = 1 - self._current_player
+        self._hash ^= SIDE_KEY
         self._number_of_passes += 1
         if self.game_is_over():
             self._score_unplayed_tiles()
+        return change
 
     def play(self, word, location, direction, hand):
         """
@@ -384,14 +745,43 @@ class Board:
         resolves the end of the game if applicable.
         """
         self.verify_legality(word, location, direction, hand)
+        self.apply_play(word, location, direction, hand)
+
+    def apply_play(self, word, location, direction, hand):
+        """
+        Same as play, but without checking that the move is legal, and returns a Change that can be passed to undo.
+        """
+        change = Change(self, hand)
         self._scores[self._current_player] += self.score(word, location, direction)
-        self.place_word(word, location, direction)
+        change.placed = self.place_word(word, location, direction)
         self.remove_tiles(word, hand)
+        before = len(hand)
         self._deal(hand, 7 - len(hand))
+        change.drawn = len(hand) - before
         self._current_player = 1 - self._current_player
+        self._hash ^= SIDE_KEY
         self._number_of_passes = 0
         if self.game_is_over():
             self._score_unplayed_tiles()
+        return change
+
+    def undo(self, change):
+        """
+        Takes back the move recorded in change, which must be the most recent move applied that has not been undone.
+        """
+        if change.old_bag is None:
+            # Drawn tiles came off the end of the bag, so put them back in reverse order
+            for i in range(change.drawn):
+                self._bag.append(change.hand.pop())
+        else:
+            self._bag[:] = change.old_bag
+        change.hand[:] = change.old_hand
+        self._remove_tiles_from_board(change.placed)
+        self._scores[:] = change.old_scores
+        if self._current_player != change.old_player:
+            self._hash ^= SIDE_KEY
+        self._current_player = change.old_player
+        self._number_of_passes = change.old_passes
 
     def get_hand(self, player_number):
         return self._hands[player_number]
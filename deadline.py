@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class Deadline:
+    """
+    Time by which an AI must choose its move, which can also be brought forward from another thread (see move_now).
+    Searches given a deadline ask whether it has passed.
+
+    A Deadline can't be sent to another process; give a worker remaining() instead, to make its own.
+    """
+    def __init__(self, seconds, now=None):
+        """
+        Makes a deadline seconds from now. If now (a threading.Event) is given, setting it makes the deadline pass.
+        """
+        self._time = time.monotonic() + seconds
+        self._now = now if now is not None else threading.Event()
+
+    def passed(self):
+        return self._now.is_set() or time.monotonic() >= self._time
+
+    def remaining(self):
+        """
+        Returns the number of seconds left, 0 if the deadline has passed.
+        """
+        if self._now.is_set():
+            return 0.0
+        return max(0.0, self._time - time.monotonic())
+
+    def within(self, seconds):
+        """
+        Returns a Deadline seconds from now, or this one's time if that is sooner, which also passes when move_now is
+        called on this one.
+        """
+        return Deadline(min(seconds, self.remaining()), self._now)
+
+    def move_now(self):
+        """
+        Makes the deadline pass at once.
+        """
+        self._now.set()
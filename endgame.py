@@ -0,0 +1,155 @@
+from board import *
+from gatekeeper import GateKeeper
+from move import *
+from gaddag import MoveGenerator
+from leave import hand_value
+
+# Kinds of bound on a value in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Default number of plays searched in each position (see EndgameSolver), at the root and below it
+ROOT_WIDTH = 20
+SEARCH_WIDTH = 8
+
+
+class _OutOfTime(Exception):
+    """
+    Raised inside the search when the deadline passes.
+    """
+
+
+class EndgameSolver:
+    """
+    Finds the best move once the bag is empty, when each player's hand is known to the other, by iterative-deepening
+    alpha-beta (negamax) search with a transposition table.
+
+    The value of a position is the spread the player to move will gain from it on, including the adjustment for tiles
+    left in hands at the end of the game. A position at the depth limit is valued as if the game ended there with
+    neither player going out.
+
+    In each position the search considers passing and the most promising width plays (root_width at the root), by
+    score plus, for a play going out, twice the value of the opponent's hand. The best play found in the previous
+    iteration is searched first. With both widths None, every play is considered and a completed search is exact.
+    """
+    def __init__(self, generator=None, width=SEARCH_WIDTH, root_width=ROOT_WIDTH):
+        self._generator = generator if generator is not None else MoveGenerator()
+        self._width = width
+        self._root_width = root_width
+        self._table = {}  # Transposition table: (depth, value, bound, best move, complete) by position key
+        self._deadline = None
+        self._horizons = 0  # Number of values so far that depended on the depth limit
+
+    def solve(self, board, deadline=None):
+        """
+        Returns (move, value): the best move (a PlayWord, or an ExchangeTiles passing) for the player to move on board,
+        which must have an empty bag, and the spread it gains (see EndgameSolver). Deeper searches are made until one
+        reaches the end of the game along every line or deadline (a Deadline) passes; the first, one
+        move deep, is always completed. The board is changed during the search but restored afterward.
+        """
+        self._table = {}
+        self._deadline = None
+        best = None
+        depth = 1
+        while True:
+            horizons = self._horizons
+            try:
+                value = self._search(board, depth, float('-inf'), float('inf'), self._root_width)
+            except _OutOfTime:
+                break
+            best = self._table[self._key(board)][3], value
+            if self._horizons == horizons:
+                break  # Every line reached the end of the game, so searching deeper would change nothing
+            self._deadline = deadline
+            depth += 1
+        move, value = best
+        if move is None:
+            return ExchangeTiles([False] * 7), value
+        return PlayWord(*move), value
+
+    @staticmethod
+    def _key(board):
+        """
+        Returns a key identifying the position on board for the transposition table.
+        """
+        return (board.get_hash(), tuple(sorted(board.get_hand(0))), tuple(sorted(board.get_hand(1))),
+                board.get_number_of_passes())
+
+    def _moves(self, board, player, first, width):
+        """
+        Returns a list of the moves to search for player: first (if it isn't None), then the most promising width
+        plays as (word, location, direction), then None for passing.
+        """
+        hand = board.get_hand(player)
+        bonus = 2 * hand_value(board.get_hand(1 - player))
+        plays = []
+        for score, word, location, direction in self._generator.generate(GateKeeper(board, player), hand):
+            if len(word) - word.count(' ') == len(hand):
+                score += bonus
+            plays.append((score, (word, location, direction)))
+        plays.sort(key=lambda play: play[0], reverse=True)
+        if width is not None:
+            plays = plays[:width]
+        moves = [move for _, move in plays] + [None]
+        if first is not None:
+            if first in moves:
+                moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def _search(self, board, depth, alpha, beta, width):
+        """
+        Returns the value (see EndgameSolver) of the position on board, searching depth moves deep and width plays in
+        this position, if it is strictly between alpha and beta; otherwise returns a bound on it on the same side of
+        the window.
+        """
+        if self._deadline is not None and self._deadline.passed():
+            raise _OutOfTime()
+        if board.game_is_over():
+            return 0
+        player = board.get_current_player()
+        if depth == 0:
+            self._horizons += 1
+            return hand_value(board.get_hand(1 - player)) - hand_value(board.get_hand(player))
+        key = self._key(board)
+        entry = self._table.get(key)
+        first = None
+        if entry is not None:
+            entry_depth, value, bound, first, complete = entry
+            if (complete or entry_depth >= depth) and (bound == EXACT or (bound == LOWER and value >= beta) or
+                                                       (bound == UPPER and value <= alpha)):
+                if not complete:
+                    self._horizons += 1
+                return value
+        horizons = self._horizons
+        original_alpha = alpha
+        best_value = float('-inf')
+        best_move = None
+        scores = board.get_scores()
+        for move in self._moves(board, player, first, width):
+            before = scores[player] - scores[1 - player]
+            if move is None:
+                change = board.apply_exchange(board.get_hand(player), [False] * 7)
+            else:
+                change = board.apply_play(*move, board.get_hand(player))
+            try:
+                gained = scores[player] - scores[1 - player] - before
+                value = gained - self._search(board, depth - 1, gained - beta, gained - alpha, self._width)
+            finally:
+                board.undo(change)
+            if value > best_value:
+                best_value = value
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+        if best_value <= original_alpha:
+            bound = UPPER
+        elif best_value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self._table[key] = depth, best_value, bound, best_move, self._horizons == horizons
+        return best_value
@@ -0,0 +1,172 @@
+import math
+import random
+from board import *
+from letter_matrix import get_letter_matrix
+from leave import distinct_exchanges
+
+# Tiles in the order draws are enumerated
+TILES = sorted(set(FULL_BAG))
+
+# Most distinct draws an expectation is computed over exactly (enough for any draw of up to two tiles)
+MOST_OUTCOMES = 400
+
+# Least probability of a draw enumerated when there are too many distinct draws to enumerate them all
+LEAST_PROBABILITY = 0.002
+
+# Number of the remaining draws sampled when there are too many distinct draws to enumerate them all
+SAMPLES = 120
+
+# Number of expectations remembered between calls to expected_words
+CACHE_SIZE = 1 << 14
+
+# Exact expected number of formable words, by sorted kept tiles, counts of unseen tiles and number of tiles drawn
+_expectations = {}
+
+
+def count_tiles(tiles):
+    """
+    Returns a dict mapping each tile in TILES to the number of times it appears in tiles.
+    """
+    counts = dict.fromkeys(TILES, 0)
+    for tile in tiles:
+        counts[tile] += 1
+    return counts
+
+
+def count_outcomes(unseen, n):
+    """
+    Returns the number of distinct multisets of n tiles that can be drawn from unseen (a dict of counts, as returned by
+    count_tiles).
+    """
+    ways = [1] + [0] * n  # ways[m] is the number of multisets of m tiles from the tiles considered so far
+    for tile in TILES:
+        ways = [sum(ways[m - j] for j in range(min(unseen[tile], m) + 1)) for m in range(n + 1)]
+    return ways[n]
+
+
+def draw_outcomes(unseen, n, least=0):
+    """
+    Returns a list of (tiles, probability) for every distinct multiset of n tiles (as a sorted string) that can be drawn
+    from unseen (see count_outcomes), with its exact (multivariate hypergeometric) probability. If least is given, only
+    the multisets with at least that probability are listed, and branches of the enumeration whose draws together are
+    less likely than that are skipped.
+    """
+    total = math.comb(sum(unseen.values()), n)
+    remaining = [0] * (len(TILES) + 1)  # remaining[i] is the number of unseen tiles from TILES[i] on
+    for i in range(len(TILES) - 1, -1, -1):
+        remaining[i] = remaining[i + 1] + unseen[TILES[i]]
+    result = []
+
+    def extend(i, drawn, left, ways):
+        # Choose how many of TILES[i] to draw, having drawn drawn with left still to draw
+        if ways * math.comb(remaining[i], left) < least * total:
+            return  # Every draw from here on together is too unlikely
+        if not left:
+            result.append((drawn, ways / total))
+            return
+        if i == len(TILES):
+            return
+        tile = TILES[i]
+        for j in range(min(unseen[tile], left), -1, -1):
+            extend(i + 1, drawn + tile * j, left - j, ways * math.comb(unseen[tile], j))
+
+    extend(0, '', n, 1)
+    return result
+
+
+def sample_outcomes(unseen, n, samples=SAMPLES, excluded=(), weight=1.0):
+    """
+    Returns a list of (tiles, weight) for the distinct multisets among samples random draws of n tiles from unseen (see
+    count_outcomes), drawing again whenever a draw is in excluded, where weight is the given weight (that of the draws
+    not excluded) times the fraction of the draws that gave tiles.
+    """
+    pool = [tile for tile in TILES for _ in range(unseen[tile])]
+    frequencies = {}
+    for _ in range(samples):
+        drawn = ''.join(sorted(random.sample(pool, n)))
+        while drawn in excluded:
+            drawn = ''.join(sorted(random.sample(pool, n)))
+        frequencies[drawn] = frequencies.get(drawn, 0) + 1
+    return [(drawn, weight * frequency / samples) for drawn, frequency in frequencies.items()]
+
+
+def _outcomes(unseen, n):
+    """
+    Returns (outcomes, exact) where outcomes is a list of (tiles, weight) for draws of n tiles from unseen (see
+    count_outcomes), weighted to give the expectation of any function of the draw. If there are at most MOST_OUTCOMES
+    distinct draws, outcomes lists every one with its probability and exact is True. Otherwise it lists those with at
+    least LEAST_PROBABILITY, plus SAMPLES draws from the rest sharing the probability left over (unless that is less
+    than LEAST_PROBABILITY too).
+    """
+    if count_outcomes(unseen, n) <= MOST_OUTCOMES:
+        return draw_outcomes(unseen, n), True
+    outcomes = draw_outcomes(unseen, n, LEAST_PROBABILITY)
+    rest = 1 - sum(probability for _, probability in outcomes)
+    if rest >= LEAST_PROBABILITY:  # Otherwise sampling the rest would mostly draw the listed draws again
+        outcomes += sample_outcomes(unseen, n, SAMPLES, {drawn for drawn, _ in outcomes}, rest)
+    return outcomes, False
+
+
+def expected_words(kept_options, unseen, bag_count, deadline=None):
+    """
+    Returns a list of the expected number of words formable from each list of kept tiles in kept_options after drawing
+    back up to seven tiles from a bag holding bag_count of the unseen tiles (a dict of counts, as returned by
+    count_tiles).
+
+    If deadline (a Deadline) is given, the evaluation stops once it passes, and the expectations not worked out by
+    then are None. Kept multisets are evaluated in order of the number of tiles drawn, fewest (and cheapest) first.
+
+    Each kept multiset is only evaluated once, and each possible full rack only once across all of them. The
+    expectation is exact when there are at most MOST_OUTCOMES distinct draws. Otherwise the likeliest draws are counted
+    exactly and the rest estimated by sampling (see _outcomes), with the same draws for every kept multiset of the same
+    size so that they are compared fairly. Exact expectations are remembered, so the same kept tiles and unseen tiles
+    on a later turn cost nothing.
+    """
+    counts = tuple(unseen[tile] for tile in TILES)
+    expected = {}
+    outcomes = {}  # List of (rack, weight) for each sorted kept multiset not already in _expectations
+    exact = set()  # Sorted kept multisets whose outcomes are exact
+    draws_by_n = {}  # (outcomes, exact) of each number of tiles drawn (see _outcomes), shared by the kept multisets
+    racks = {}  # Index of each distinct rack in the batch passed to the LetterMatrix
+    for kept in sorted(kept_options, key=len, reverse=True):
+        kept = ''.join(sorted(kept))
+        n = min(7 - len(kept), bag_count)
+        if kept in expected or kept in outcomes:
+            continue
+        if (kept, counts, n) in _expectations:
+            expected[kept] = _expectations[kept, counts, n]
+            continue
+        if n not in draws_by_n:
+            if deadline is not None and deadline.passed():
+                break
+            draws_by_n[n] = _outcomes(unseen, n)
+        draws, is_exact = draws_by_n[n]
+        if is_exact:
+            exact.add(kept)
+        outcomes[kept] = [(''.join(sorted(kept + drawn)), weight) for drawn, weight in draws]
+        for rack, _ in outcomes[kept]:
+            racks.setdefault(rack, len(racks))
+    if racks:
+        words = get_letter_matrix().count_formable(list(racks), deadline=deadline)
+        for kept, draws in outcomes.items():
+            if any(racks[rack] >= len(words) for rack, _ in draws):
+                continue  # Out of time before every rack it can draw was counted
+            expected[kept] = float(sum(weight * words[racks[rack]] for rack, weight in draws))
+            if kept not in exact:
+                continue  # A later call may sample differently
+            if len(_expectations) >= CACHE_SIZE:
+                del _expectations[next(iter(_expectations))]
+            _expectations[kept, counts, min(7 - len(kept), bag_count)] = expected[kept]
+    return [expected.get(''.join(sorted(kept))) for kept in kept_options]
+
+
+def evaluate_exchanges(hand, unseen, bag_count, deadline=None):
+    """
+    Returns a list of [tiles_to_exchange, expected] for every distinct way (see distinct_exchanges) of keeping tiles
+    from hand, including keeping them all, where expected is as for expected_words. If deadline (a Deadline) is given,
+    only the ways evaluated before it passed are listed.
+    """
+    options = distinct_exchanges(hand)
+    words = expected_words([kept for _, kept in options], unseen, bag_count, deadline)
+    return [[tiles_to_exchange, expected] for (tiles_to_exchange, _), expected in zip(options, words)
+            if expected is not None]
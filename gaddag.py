@@ -0,0 +1,521 @@
+import heapq
+import multiprocessing
+from location import *
+from board import *
+from lexicon import *
+from anagram import get_anagram_index
+
+# Letter and word multipliers of the premium squares
+LETTER_MULTIPLIERS = {DOUBLE_LETTER_SCORE: 2, TRIPLE_LETTER_SCORE: 3}
+WORD_MULTIPLIERS = {DOUBLE_WORD_SCORE: 2, TRIPLE_WORD_SCORE: 3}
+
+
+class Gaddag(Automaton):
+    """
+    GADDAG (Gordon, 1994) for a set of words, used to generate moves outward from an anchor square.
+
+    For a word w of length n, the strings rev(w[:i]) + SEPARATOR + w[i:] are stored for i in 1..n, so a word can be
+    found starting from any of its letters: first walk left from that letter, then cross the separator and walk right.
+    """
+    @staticmethod
+    def strings(words):
+        for word in words:
+            for i in range(1, len(word) + 1):
+                yield word[i - 1::-1] + SEPARATOR + word[i:]
+
+    def __contains__(self, word):
+        node = self.walk(word[0] + SEPARATOR + word[1:])
+        return bool(node) and self.is_final(node)
+
+
+# More than the number of moves through any one anchor, for numbering moves in the order generate lists them
+MOVES_PER_ANCHOR = 1 << 20
+
+# Number of anchors whose moves a MoveGenerator remembers (see MoveGenerator)
+MOVE_CACHE_SIZE = 1 << 12
+
+# Compiled GADDAG, built from words.txt the first time it is needed (or by running lexicon.py)
+GADDAG_PATH = os.path.join(current_dir, 'words.gaddag')
+
+_gaddag = None
+
+
+def get_gaddag():
+    """
+    Returns the GADDAG for DICTIONARY. It is loaded the first time it is needed rather than at import time, because
+    compiling it (when words.txt has changed) takes several seconds.
+    """
+    global _gaddag
+    if _gaddag is None:
+        _gaddag = Gaddag.load(WORDS_PATH, GADDAG_PATH)
+    return _gaddag
+
+
+class MoveGenerator:
+    """
+    Generates every legal move for a hand by walking the GADDAG outward from each anchor square (an empty square next
+    to a tile, or the center on an empty board), using cross-checks so that only placements forming legal cross words
+    are ever produced.
+
+    If processes is given, the 30 rows and columns are instead divided among a pool of that many worker processes,
+    started the first time it is needed and kept until close is called. Each worker maps the GADDAG once.
+
+    The moves through each anchor are remembered, keyed by everything they depend on: the rack and the tiles, cross
+    checks and anchors along the anchor's line. A play changes only its own line and the lines crossing its tiles, so
+    when the same rack is used again on a later board, the moves along every other line are reused rather than
+    generated again. Only the most recent MOVE_CACHE_SIZE anchors are kept.
+    """
+    def __init__(self, gaddag=None, anagrams=None, processes=None):
+        self._gaddag = gaddag
+        self._anagrams = anagrams
+        self._processes = processes
+        self._pool = None
+        self._squares = None
+        self._anchors = None
+        self._moves = None
+        self._cache = {}
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any. The generator can still be used; a new pool is started if needed.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def generate(self, gatekeeper, hand, k=None, deadline=None):
+        """
+        Returns a list of [score, word, location, direction] for every legal play of tiles from hand on the board seen
+        through gatekeeper. Words use the same conventions as PlayWord: spaces for tiles already on the board and
+        upper-case letters for blanks.
+
+        If k is given, returns only the k highest-scoring moves, best first. Ties go to the move that would have come
+        first in the full list, so the result is the start of the full list stably sorted by descending score.
+
+        If deadline (a Deadline) is given, serial generation stops once it has passed and at least one
+        move has been found, returning only the moves found so far. Since the top k are searched for in decreasing
+        order of their bounds, those found first are the most promising.
+        """
+        if self._gaddag is None:
+            self._gaddag = get_gaddag()
+        self._squares = [gatekeeper.get_square(location) for location in SQUARES] + [NO_PREMIUM]
+        self._anchors = {anchor.index() for anchor in gatekeeper.get_anchors()}
+        self._moves = []
+        rack = self._rack(hand)
+        if k is not None and self._processes is None:
+            return self._generate_best(gatekeeper, hand, rack, k, deadline)
+        if self._processes is None:
+            moves = []
+            for direction in HORIZONTAL, VERTICAL:
+                cross_checks, touching = self._cross_checks(gatekeeper, direction)
+                for line in range(WIDTH):
+                    if deadline is not None and moves and deadline.passed():
+                        break
+                    key = self._line_key(line, direction, rack, cross_checks, touching)
+                    for anchor in self._line_anchors(line, direction):
+                        moves.extend(self._anchor_moves(key, line, direction, rack, cross_checks, touching, anchor))
+            self._moves = moves
+        else:
+            self._generate_in_parallel(gatekeeper, rack)
+        for move in self._moves:
+            move[0] = gatekeeper.score(move[1], move[2], move[3])
+        if k is not None:
+            # Workers can't share the bound that lets the serial search skip anchors, so pick the best afterward
+            self._moves = sorted(self._moves, key=lambda move: move[0], reverse=True)[:k]
+        return self._moves
+
+    def _generate_in_parallel(self, gatekeeper, rack):
+        """
+        Adds to self._moves every legal move, generating each line with anchors not already in the cache in a worker
+        process. Moves are listed in the same order as when generated serially.
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self._processes, initializer=start_worker)
+        # (key, direction, anchors, moves through each anchor) for each line, with None for the moves of the lines
+        # generated by workers. Cached moves are looked up here, since remembering the new ones may evict them.
+        lines = []
+        tasks = []
+        for direction in HORIZONTAL, VERTICAL:
+            cross_checks, touching = self._cross_checks(gatekeeper, direction)
+            for line in range(WIDTH):
+                key = self._line_key(line, direction, rack, cross_checks, touching)
+                anchors = self._line_anchors(line, direction)
+                cached = [self._cache.get((key, anchor, None)) for anchor in anchors]
+                if any(moves is None for moves in cached):
+                    lines.append((key, direction, anchors, None))
+                    tasks.append((self._squares, self._anchors, rack, line, direction, cross_checks, touching,
+                                  anchors))
+                else:
+                    lines.append((key, direction, anchors, cached))
+        results = iter(self._pool.map(_generate_line_in_worker, tasks))
+        for key, direction, anchors, cached in lines:
+            if cached is None:
+                cached = next(results)
+                for anchor, moves in zip(anchors, cached):
+                    self._remember((key, anchor, None), moves)
+            for moves in cached:
+                self._moves.extend([0, word, location, direction] for word, location in moves)
+
+    def _generate_best(self, gatekeeper, hand, rack, k, deadline=None):
+        """
+        Returns the k highest-scoring moves (see generate). Anchors are searched in decreasing order of an upper bound
+        on the score of any move through them, keeping the best moves so far in a heap. An anchor is skipped if its
+        bound shows that none of its moves could make the top k, and searched only for moves of at most six tiles if
+        that is true of its seven-tile moves. The search stops early if deadline passes (see generate).
+        """
+        if self._anagrams is None:
+            self._anagrams = get_anagram_index()
+        values = sorted((TILE_VALUES[tile] for tile in hand), reverse=True)
+        bingos = {}  # Whether the rack plus each multiset of board letters makes a word, by the sorted board letters
+        tasks = []
+        for a, direction in enumerate((HORIZONTAL, VERTICAL)):
+            cross_checks, touching = self._cross_checks(gatekeeper, direction)
+            weights = self._weights(gatekeeper, direction, touching)
+            for line in range(WIDTH):
+                key = self._line_key(line, direction, rack, cross_checks, touching)
+                for anchor, (shorter, bingo) in self._line_bounds(line, direction, hand, values, weights,
+                                                                  bingos).items():
+                    # Moves are numbered in the order the full list would have them
+                    first = ((a * WIDTH + line) * WIDTH + anchor) * MOVES_PER_ANCHOR
+                    tasks.append((max(shorter, bingo), bingo, first, key, line, direction, anchor, cross_checks,
+                                  touching))
+        tasks.sort(key=lambda task: (-task[0], task[2]))
+        heap = []  # (score, -number, move) for the best moves so far, worst first
+        for bound, bingo, first, key, line, direction, anchor, cross_checks, touching in tasks:
+            if deadline is not None and heap and deadline.passed():
+                break
+            most = None
+            if len(heap) == k:
+                if (bound, -first) <= heap[0][:2]:
+                    continue
+                if (bingo, -first) <= heap[0][:2]:
+                    most = 6
+            self._moves = self._anchor_moves(key, line, direction, rack, cross_checks, touching, anchor, most)
+            for n, move in enumerate(self._moves):
+                move[0] = gatekeeper.score(move[1], move[2], move[3])
+                entry = (move[0], -(first + n), move)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, entry)
+        self._moves = [entry[2] for entry in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+        return self._moves
+
+    def _weights(self, gatekeeper, direction, touching):
+        """
+        For moves in direction, returns two lists indexed by square, base and slope, such that playing a tile worth v
+        points on an empty square adds base + v * slope for the cross word there (if any).
+        """
+        cross = direction.orthogonal()
+        following = NEXT[axis(cross)]
+        base = [0] * OFF_BOARD
+        slope = [0] * OFF_BOARD
+        for index in range(OFF_BOARD):
+            # Only a square with a cross word, or one at the far edge of the board, scores anything (see Board)
+            if not self._squares[index].isalpha() and (touching[index] or following[index] == OFF_BOARD):
+                base[index] = gatekeeper.score_cross_word('_', SQUARES[index], cross)
+                slope[index] = gatekeeper.score_cross_word('e', SQUARES[index], cross) - base[index]
+        return base, slope
+
+    def _line_bounds(self, line, direction, hand, values, weights, bingos):
+        """
+        Returns a dict mapping the position of each anchor along line to upper bounds on the score of any move in
+        direction through it that places fewer than seven tiles, and of any that places seven (0 if there can be
+        none). Each is the best score any arrangement of the rack's tiles could get, ignoring what is a word, except
+        that seven tiles are only considered where they and the tiles between and beside them have an anagram.
+        :param values: The values of the tiles in the rack, highest first.
+        :param weights: See _weights.
+        :param bingos: Cache of the anagram checks, shared between calls with the same hand.
+        """
+        indices = self._line_indices(line, direction)
+        tiles = [self._squares[index] for index in indices]
+        occupied = [tile.isalpha() for tile in tiles]
+        base = [weights[0][index] for index in indices]
+        slope = [weights[1][index] for index in indices]
+        letter_multipliers = [LETTER_MULTIPLIERS.get(tile, 1) for tile in tiles]
+        word_multipliers = [WORD_MULTIPLIERS.get(tile, 1) for tile in tiles]
+        last = WIDTH - 1
+        n = len(values)
+        # totals[pos] is the total value of the tiles before position pos
+        totals = [0]
+        for tile in tiles:
+            totals.append(totals[-1] + (TILE_VALUES[tile] if tile.isalpha() else 0))
+        bounds = {}
+        for anchor in range(WIDTH):
+            if indices[anchor] not in self._anchors:
+                continue
+            # Other empty squares the move could fill, nearest first: up to n - 1 on each side, and on the left not
+            # past an empty anchor (that anchor's moves include those)
+            left = []
+            pos = anchor - 1
+            while pos >= 0 and len(left) < n - 1:
+                if not occupied[pos]:
+                    if indices[pos] in self._anchors:
+                        break
+                    left.append(pos)
+                pos -= 1
+            right = []
+            pos = anchor + 1
+            while pos < WIDTH and len(right) < n - 1:
+                if not occupied[pos]:
+                    right.append(pos)
+                pos += 1
+            shorter = bingo = 0
+            # A move fills every empty square from its first to its last, so try each such run through the anchor
+            for i in range(len(left) + 1):
+                start = left[i - 1] if i else anchor
+                while start > 0 and occupied[start - 1]:
+                    start -= 1
+                filled = [anchor] + left[:i]
+                for j in range(min(len(right), n - 1 - i) + 1):
+                    if j:
+                        filled.append(right[j - 1])
+                    end = filled[-1] if j else anchor
+                    while end < last and occupied[end + 1]:
+                        end += 1
+                    if len(filled) == 7:
+                        board_letters = ''.join(sorted(tile.lower() for tile in tiles[start:end + 1] if tile.isalpha()))
+                        if board_letters not in bingos:
+                            bingos[board_letters] = self._anagrams.has_anagram(''.join(hand) + board_letters)
+                        if not bingos[board_letters]:
+                            continue
+                    word_multiplier = 1
+                    for pos in filled:
+                        word_multiplier *= word_multipliers[pos]
+                    # Each point of a tile's value is worth its square's weight, so the best arrangement puts the
+                    # highest-value tiles on the heaviest squares
+                    score = (totals[end + 1] - totals[start]) * word_multiplier
+                    square_weights = []
+                    for pos in filled:
+                        score += base[pos]
+                        square_weights.append(letter_multipliers[pos] * word_multiplier + slope[pos])
+                    square_weights.sort(reverse=True)
+                    for value, weight in zip(values, square_weights):
+                        score += value * weight
+                    if len(filled) == 7:
+                        bingo = max(bingo, score + 50)
+                    else:
+                        shorter = max(shorter, score)
+            bounds[anchor] = shorter, bingo
+        return bounds
+
+    def _line_key(self, line, direction, rack, cross_checks, touching):
+        """
+        Returns a tuple of everything the moves along line in direction depend on, for use as a cache key.
+        """
+        indices = self._line_indices(line, direction)
+        return (axis(direction), line, tuple(rack), tuple(self._squares[index] for index in indices),
+                tuple(cross_checks[index] for index in indices), tuple(touching[index] for index in indices),
+                tuple(index in self._anchors for index in indices))
+
+    def _line_anchors(self, line, direction):
+        """
+        Returns the list of positions along line in direction of the anchors on it, in order.
+        """
+        return [pos for pos, index in enumerate(self._line_indices(line, direction)) if index in self._anchors]
+
+    def _anchor_moves(self, key, line, direction, rack, cross_checks, touching, anchor, most=None):
+        """
+        Returns a new list of the moves (with scores of 0) that _generate_line finds through the anchor at position
+        anchor along line, taking them from the cache if possible. key is the line's _line_key.
+        """
+        moves = self._cache.get((key, anchor, most))
+        if moves is None and most is not None:
+            moves = self._cache.get((key, anchor, None))
+            if moves is not None:
+                moves = [(word, location) for word, location in moves if len(word) - word.count(' ') <= most]
+        if moves is None:
+            self._moves = []
+            self._generate_line(line, direction, rack, cross_checks, touching, anchor, most)
+            moves = [(move[1], move[2]) for move in self._moves]
+            self._remember((key, anchor, most), moves)
+        return [[0, word, location, direction] for word, location in moves]
+
+    def _remember(self, key, moves):
+        """
+        Caches moves, a list of (word, location) pairs, under key, forgetting the oldest entry if the cache is full.
+        """
+        if len(self._cache) >= MOVE_CACHE_SIZE:
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = moves
+
+    @staticmethod
+    def _line_indices(line, direction):
+        """
+        Returns the list of indices of the squares along line (a row or column) in direction.
+        """
+        if direction == HORIZONTAL:
+            return [line * WIDTH + i for i in range(WIDTH)]
+        return [i * WIDTH + line for i in range(WIDTH)]
+
+    @staticmethod
+    def _rack(hand):
+        """
+        Returns a list of 27 counts, one for each letter and, at the end, one for blanks.
+        """
+        rack = [0] * 27
+        for tile in hand:
+            rack[26 if tile == '_' else LETTER_INDEX[tile]] += 1
+        return rack
+
+    def _cross_checks(self, gatekeeper, direction):
+        """
+        For moves in direction, returns two lists indexed by square: the bit mask of letters that could be played
+        there without forming an illegal cross word, and whether the square is connected for the purposes of
+        Board.would_be_connected (it has a tile beside it in the cross direction, or it is the center).
+        """
+        squares = self._squares
+        cross = direction.orthogonal()
+        previous = PREVIOUS[axis(cross)]
+        following = NEXT[axis(cross)]
+        cross_checks = [ALL_LETTERS] * OFF_BOARD
+        touching = [False] * OFF_BOARD
+        touching[CENTER.index()] = True
+        for index in range(OFF_BOARD):
+            if squares[previous[index]].isalpha() or squares[following[index]].isalpha():
+                touching[index] = True
+            if touching[index] and not squares[index].isalpha():
+                cross_checks[index] = gatekeeper.get_cross_check(SQUARES[index], cross)
+        return cross_checks, touching
+
+    def _generate_line(self, line, direction, rack, cross_checks, touching, only=None, most=None):
+        """
+        Adds to self._moves every legal move in direction along line (a row or column), or if only is given, every
+        such move through the anchor at that position. If most is given, only moves placing at most that many tiles are
+        added.
+        """
+        indices = self._line_indices(line, direction)
+        tiles = [self._squares[index] for index in indices]
+        occupied = [tile.isalpha() for tile in tiles]
+        checks = [cross_checks[index] for index in indices]
+        touch = [touching[index] for index in indices]
+        anchors = [index in self._anchors for index in indices]
+        last = WIDTH - 1
+        gaddag = self._gaddag
+        child = gaddag.child
+        is_final = gaddag.is_final
+        letters = gaddag.letters
+        moves = self._moves
+
+        def record(start, word):
+            if direction == HORIZONTAL:
+                location = Location(line, start)
+            else:
+                location = Location(start, line)
+            moves.append([0, word, location, direction])
+
+        def extend_left(pos, word, node, connected, tiles_left):
+            # Fill square pos, at or before the anchor
+            if occupied[pos]:
+                step_left(pos, ' ', LETTER_INDEX[tiles[pos].lower()], word, node, connected or touch[pos], tiles_left)
+                return
+            if not tiles_left:
+                return
+            mask = checks[pos] & letters(node)
+            connected = connected or touch[pos]
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                i = bit.bit_length() - 1
+                if rack[i]:
+                    rack[i] -= 1
+                    step_left(pos, SYMBOLS[i], i, word, node, connected, tiles_left - 1)
+                    rack[i] += 1
+                if rack[26]:
+                    rack[26] -= 1
+                    step_left(pos, SYMBOLS[i].upper(), i, word, node, connected, tiles_left - 1)
+                    rack[26] += 1
+
+        def step_left(pos, tile, i, word, node, connected, tiles_left):
+            node = child(node, i)
+            if not node:
+                return
+            word = tile + word
+            if pos == 0 or not occupied[pos - 1]:
+                # The word could start here, so cross the separator and head right from the anchor
+                separated = child(node, SEPARATOR_INDEX)
+                if separated:
+                    if (is_final(separated) and connected and len(word) > 1 and
+                            (anchor == last or not occupied[anchor + 1])):
+                        record(pos, word)
+                    if anchor < last:
+                        extend_right(anchor + 1, pos, word, separated, connected, tiles_left)
+            if pos > 0 and (occupied[pos - 1] or not anchors[pos - 1]):
+                extend_left(pos - 1, word, node, connected, tiles_left)
+
+        def extend_right(pos, start, word, node, connected, tiles_left):
+            # Fill square pos, after the anchor
+            if occupied[pos]:
+                step_right(pos, start, ' ', LETTER_INDEX[tiles[pos].lower()], word, node, connected or touch[pos],
+                           tiles_left)
+                return
+            if not tiles_left:
+                return
+            mask = checks[pos] & letters(node)
+            connected = connected or touch[pos]
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                i = bit.bit_length() - 1
+                if rack[i]:
+                    rack[i] -= 1
+                    step_right(pos, start, SYMBOLS[i], i, word, node, connected, tiles_left - 1)
+                    rack[i] += 1
+                if rack[26]:
+                    rack[26] -= 1
+                    step_right(pos, start, SYMBOLS[i].upper(), i, word, node, connected, tiles_left - 1)
+                    rack[26] += 1
+
+        def step_right(pos, start, tile, i, word, node, connected, tiles_left):
+            node = child(node, i)
+            if not node:
+                return
+            word += tile
+            if pos == last or not occupied[pos + 1]:
+                if is_final(node) and connected:
+                    record(start, word)
+            if pos < last:
+                extend_right(pos + 1, start, word, node, connected, tiles_left)
+
+        tiles_in_rack = sum(rack) if most is None else min(sum(rack), most)
+        for anchor in range(WIDTH):
+            if anchors[anchor] and (only is None or anchor == only):
+                extend_left(anchor, '', gaddag.root, False, tiles_in_rack)
+
+
+# MoveGenerator of a worker process, created when the worker starts (see start_worker)
+_worker_generator = None
+
+
+def start_worker():
+    """
+    Initializer for a pool of worker processes that generate moves: creates the worker's MoveGenerator (see
+    get_worker_generator), which maps the GADDAG once and keeps its cache from one task to the next.
+    """
+    global _worker_generator
+    _worker_generator = MoveGenerator(get_gaddag())
+
+
+def get_worker_generator():
+    """
+    Returns the MoveGenerator of the worker process this is called in (see start_worker).
+    """
+    return _worker_generator
+
+
+def _generate_line_in_worker(task):
+    """
+    Returns, for each of the positions of anchors in task, the list of (word, location) pairs for the moves that the
+    worker's MoveGenerator finds through it. task is a tuple of the board's squares and anchors, the arguments to
+    MoveGenerator._generate_line and the positions.
+    """
+    squares, anchors, rack, line, direction, cross_checks, touching, positions = task
+    _worker_generator._squares = squares
+    _worker_generator._anchors = anchors
+    result = []
+    for anchor in positions:
+        _worker_generator._moves = []
+        _worker_generator._generate_line(line, direction, rack, cross_checks, touching, anchor)
+        result.append([(move[1], move[2]) for move in _worker_generator._moves])
+    return result
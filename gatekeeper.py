@@ -1,3 +1,6 @@
+from location import SQUARES
+
+
 class GateKeeper:
     """
     Intermediary between an AI and a Board, allowing the former to get information it needs without allowing full
@@ -21,12 +24,56 @@ class GateKeeper:
         """
         self._board.verify_legality(word, location, direction, self._board.get_hand(self._player_number))
 
+    def get_anchors(self):
+        """
+        Returns the empty squares where a move could connect to the tiles on the board: those next to a tile, or the
+        center if the board is empty. Every legal move places a tile on at least one of them.
+        """
+        return frozenset(SQUARES[i] for i in self._board.get_anchors())
+
+    def evaluate(self, word, location, direction):
+        """
+        Returns the score for playing word at location in direction from the AI's current hand if that is legal, or
+        otherwise a negative failure code (see board.FAILURE_MESSAGES). Unlike verify_legality followed by score, this
+        raises no exception and walks the board only once.
+        """
+        return self._board.evaluate(word, location, direction, self._board.get_hand(self._player_number))
+
+    def evaluate_all(self, candidates):
+        """
+        Returns a list of the results of evaluate for each (word, location, direction) in candidates.
+        """
+        return self._board.evaluate_all(candidates, self._board.get_hand(self._player_number))
+
+    def get_hash(self, include_hand=True):
+        """
+        Returns a 64-bit Zobrist hash of the tiles on the board and the player to move, and by default of the AI's
+        hand, for use as a key in caches and transposition tables. Equal positions always have equal hashes.
+        """
+        if include_hand:
+            return self._board.get_hash(self._board.get_hand(self._player_number))
+        return self._board.get_hash()
+
+    def get_cross_check(self, location, direction):
+        """
+        Returns a bit mask (bit 0 for a, bit 1 for b, etc.) of the letters that could be played at the empty square
+        location without forming an illegal word in direction.
+        """
+        return self._board.get_cross_check(location, direction)
+
     def score(self, word, location, direction):
         """
         Returns the score for playing word at location in direction. Assumes this is a legal play.
         """
         return self._board.score(word, location, direction)
 
+    def score_cross_word(self, tile, location, direction):
+        """
+        Returns the score that playing tile at the empty square location adds for the cross word in direction, as
+        counted by score. Assumes this is a legal play.
+        """
+        return self._board.score_cross_word(tile, location, direction)
+
     def get_hand(self):
         """
         Returns a copy of the AI's hand.
@@ -51,6 +98,44 @@ class GateKeeper:
         """
         return self._board.get_bag_count()
 
+    def get_unseen(self):
+        """
+        Returns a dict of the number of each tile (_ for a blank) that the AI can't see: those in the bag or the
+        opponent's hand. Every tile is included, even if none are unseen.
+        """
+        return self._board.get_unseen(self._player_number)
+
+    def get_unseen_tiles(self):
+        """
+        Returns a str of the unseen tiles (see get_unseen), each as many times as it is unseen.
+        """
+        return ''.join(tile * n for tile, n in self.get_unseen().items())
+
+    def get_endgame_board(self):
+        """
+        Returns a copy of the board, including both hands, for searching the endgame. This is only allowed once the bag
+        is empty, when the opponent's hand can be deduced from the unseen tiles anyway; otherwise raises ValueError.
+        """
+        if self._board.get_bag_count():
+            raise ValueError("The opponent's hand is hidden while tiles remain in the bag.")
+        return self._board.copy()
+
+    def get_hypothetical_board(self, opponent_hand, bag):
+        """
+        Returns a copy of the board in which the opponent's hand and the bag (last tile drawn first) are replaced by
+        the given tiles, which must together be exactly the unseen tiles (see get_unseen); otherwise raises
+        ValueError. This lets the AI search positions consistent with what it knows.
+        """
+        unseen = self.get_unseen()
+        for tile in list(opponent_hand) + list(bag):
+            unseen[tile] = unseen.get(tile, 0) - 1
+        if any(unseen.values()):
+            raise ValueError('The opponent\'s hand and the bag must hold exactly the unseen tiles.')
+        board = self._board.copy()
+        board.get_hand(1 - self._player_number)[:] = opponent_hand
+        board.set_bag(bag)
+        return board
+
     def get_opponent_hand_size(self):
         """
         Returns the number of tiles left in the opponent's hand.
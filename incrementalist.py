@@ -1,9 +1,13 @@
 from location import *
 from board import *
 from move import *
+import itertools
 
 ALL_TILES = [True] * 7
 
+# Letters a blank can stand for
+BLANK_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
 
 class Incrementalist:
     """
@@ -29,16 +33,13 @@ class Incrementalist:
         for i in range(len(hand)):
             for j in range(len(hand)):
                 if i != j:
-                    try:
-                        # This could be improved slightly by trying all possibilities for the blank
-                        word = (hand[i] + hand[j]).replace('_', 'E')
-                        self._gatekeeper.verify_legality(word, CENTER, HORIZONTAL)
-                        score = self._gatekeeper.score(word, CENTER, HORIZONTAL)
+                    # Try every letter for each blank
+                    options = [BLANK_LETTERS if tile == '_' else tile for tile in (hand[i], hand[j])]
+                    for word in map(''.join, itertools.product(*options)):
+                        score = self._gatekeeper.evaluate(word, CENTER, HORIZONTAL)  # Negative if not legal
                         if score > best_score:
                             best_score = score
                             best_word = word
-                    except:
-                        pass  # This move wasn't legal; go on to the next one
         if best_score > -1:
             return PlayWord(best_word, CENTER, HORIZONTAL)
         return ExchangeTiles(ALL_TILES)
@@ -48,21 +49,22 @@ class Incrementalist:
         best_score = -1
         best_move = None
         for tile in hand:
-            if tile == '_':
-                tile = 'E'  # This could be improved slightly by trying all possibilities for the blank
-            for word in tile + ' ', ' ' + tile:
-                for row in range(WIDTH):
-                    for col in range(WIDTH):
-                        location = Location(row, col)
-                        for direction in HORIZONTAL, VERTICAL:
-                            try:
-                                self._gatekeeper.verify_legality(word, location, direction)
-                                score = self._gatekeeper.score(word, CENTER, HORIZONTAL)
-                                if score > best_score:
-                                    best_score = score
-                                    best_move = PlayWord(word, location, direction)
-                            except:
-                                pass  # This move wasn't legal; go on to the next one
+            # The new tile must go on an anchor square, either before or after an existing tile
+            for anchor in self._gatekeeper.get_anchors():
+                if tile == '_':
+                    # Only letters that form legal words both ways are worth trying for the blank
+                    mask = (self._gatekeeper.get_cross_check(anchor, HORIZONTAL) &
+                            self._gatekeeper.get_cross_check(anchor, VERTICAL))
+                    letters = [letter for i, letter in enumerate(BLANK_LETTERS) if mask & (1 << i)]
+                else:
+                    letters = [tile]
+                for letter in letters:
+                    for direction in HORIZONTAL, VERTICAL:
+                        for word, location in (letter + ' ', anchor), (' ' + letter, anchor - direction):
+                            score = self._gatekeeper.evaluate(word, location, direction)  # Negative if not legal
+                            if score > best_score:
+                                best_score = score
+                                best_move = PlayWord(word, location, direction)
         if best_move:
             return best_move
         return ExchangeTiles(ALL_TILES)
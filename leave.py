@@ -0,0 +1,199 @@
+from array import array
+import bisect
+import itertools
+import mmap
+from board import *
+from lexicon import write_atomically
+
+# Rough equity, in points, of keeping each tile on the rack, before adjusting for duplicates and vowel balance
+TILE_EQUITIES = {'_': 25.0, 's': 8.0, 'z': 5.0, 'x': 3.5, 'r': 1.5, 'e': 1.0, 'h': 1.0, 'a': 0.5, 'c': 0.5, 'd': 0.5,
+                 'm': 0.5, 'n': 0.5, 't': 0.0, 'l': -0.5, 'i': -1.0, 'k': -1.0, 'p': -1.0, 'y': -1.0, 'j': -1.5,
+                 'o': -1.5, 'f': -2.0, 'g': -2.0, 'b': -2.5, 'w': -3.0, 'u': -4.5, 'v': -5.5, 'q': -7.0}
+
+# Penalty for each extra copy of a letter, and for each vowel or consonant beyond the first one in excess
+DUPLICATE_PENALTY = 3.0
+BALANCE_PENALTY = 2.5
+
+# Extra penalty for keeping a q without a u
+Q_WITHOUT_U_PENALTY = 5.0
+
+# Most tiles a leave can have, since a play or exchange uses at least one of the seven
+MOST_KEPT = 6
+
+# Number of possible tiles in a key position: 0 for none, then _ and the letters in sorted order
+BASE = 28
+
+
+def estimate_leave(leave):
+    """
+    Returns a rough estimate of the value of keeping the tiles in leave (a string), used when no fitted values are
+    available.
+    """
+    value = 0.0
+    vowels = consonants = 0
+    for tile in set(leave):
+        n = leave.count(tile)
+        value += n * TILE_EQUITIES[tile]
+        if tile != '_':
+            value -= (n - 1) * DUPLICATE_PENALTY
+            if tile in 'aeiou':
+                vowels += n
+            else:
+                consonants += n
+    value -= max(0, abs(vowels - consonants) - 1) * BALANCE_PENALTY
+    if 'q' in leave and 'u' not in leave:
+        value -= Q_WITHOUT_U_PENALTY
+    return value
+
+
+def leave_key(leave):
+    """
+    Returns the integer key of leave in a LeaveTable. The order of the tiles doesn't matter.
+    """
+    key = 0
+    for tile in sorted(leave):
+        key = key * BASE + (1 if tile == '_' else LETTER_INDEX[tile] + 2)
+    return key
+
+
+def all_leaves():
+    """
+    Yields every leave that can occur (every multiset of 0 through MOST_KEPT tiles from FULL_BAG), as sorted strings.
+    """
+    tiles = sorted(set(FULL_BAG))
+    available = {tile: FULL_BAG.count(tile) for tile in tiles}
+    stack = [('', 0)]  # Each leave, and the index in tiles of the first tile that may still be added to it
+    while stack:
+        leave, first = stack.pop()
+        yield leave
+        if len(leave) < MOST_KEPT:
+            for i in range(first, len(tiles)):
+                if leave.count(tiles[i]) < available[tiles[i]]:
+                    stack.append((leave + tiles[i], i))
+
+
+def distinct_exchanges(hand):
+    """
+    Returns a list of (tiles_to_exchange, kept) for each distinct multiset of tiles that can be kept from hand, where
+    tiles_to_exchange is a list of seven bools, as for ExchangeTiles, and kept is a sorted string. Of the ways of
+    keeping the same tiles (when hand has duplicates), the first in itertools.product order is used.
+    """
+    result = {}
+    for option in itertools.product([True, False], repeat=len(hand)):
+        kept = ''.join(sorted(tile for tile, exchanged in zip(hand, option) if not exchanged))
+        if kept not in result:
+            result[kept] = list(option) + [False] * (7 - len(hand))
+    return [(tiles_to_exchange, kept) for kept, tiles_to_exchange in result.items()]
+
+
+def kept_tiles(word, hand):
+    """
+    Returns the list of tiles left in hand after playing word (as for PlayWord).
+    """
+    kept = list(hand)
+    for tile in word:
+        if tile != ' ':
+            kept.remove('_' if tile.isupper() else tile)
+    return kept
+
+
+def hand_value(hand):
+    """
+    Returns the total value of the tiles in hand, which a player loses (and their opponent gains, on going out) if
+    they are left in it at the end of the game.
+    """
+    return sum(TILE_VALUES[tile] for tile in hand)
+
+
+class LeaveTable:
+    """
+    Value, in points, of every leave (the tiles kept on the rack after a move). Keys (see leave_key) are stored in
+    sorted order, so a value is found by binary search without any per-entry objects. keys and values are parallel
+    sequences.
+
+    The file format is the number of leaves n, then n keys as unsigned ints, then n values as floats. A file is
+    memory-mapped, like the compiled word lists.
+    """
+    def __init__(self, keys, values):
+        self.keys = keys
+        self.values = values
+
+    @classmethod
+    def build(cls, value=estimate_leave):
+        """
+        Returns a new table, built in memory, giving each leave the value value(leave).
+        """
+        entries = sorted((leave_key(leave), value(leave)) for leave in all_leaves())
+        return cls(array('I', (key for key, _ in entries)), array('f', (v for _, v in entries)))
+
+    def save(self, path):
+        """
+        Writes this table to the file at path.
+        """
+        write_atomically(path, array('I', [len(self.keys)]).tobytes() + array('I', self.keys).tobytes() +
+                         array('f', self.values).tobytes())
+
+    @classmethod
+    def open(cls, path):
+        """
+        Returns the table stored in the file at path, memory-mapped rather than read.
+        """
+        with open(path, 'rb') as file:
+            mapped = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        n = mapped[:4].cast('I')[0]
+        return cls(mapped[4:4 + 4 * n].cast('I'), mapped[4 + 4 * n:].cast('f'))
+
+    def find(self, key):
+        """
+        Returns the position of key in keys, or -1 if it is not there.
+        """
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return -1
+        return i
+
+    def value(self, leave):
+        """
+        Returns the value of keeping the tiles in leave. Raises KeyError if leave can't occur.
+        """
+        i = self.find(leave_key(leave))
+        if i < 0:
+            raise KeyError(leave)
+        return self.values[i]
+
+    def rank_exchanges(self, hand):
+        """
+        Returns a list of [tiles_to_exchange, value] for every distinct way (see distinct_exchanges) of exchanging one
+        or more tiles from hand, best first, where value is that of the tiles kept.
+        """
+        result = [[tiles_to_exchange, self.value(kept)] for tiles_to_exchange, kept in distinct_exchanges(hand)
+                  if len(kept) < len(hand)]
+        return sorted(result, key=lambda x: x[1], reverse=True)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Leave values, built from estimate_leave the first time they are needed (or by running leave.py) unless fitted
+# values have been saved there
+LEAVES_PATH = os.path.join(current_dir, 'leaves.bin')
+
+_leave_table = None
+
+
+def get_leave_table():
+    """
+    Returns the LeaveTable stored at LEAVES_PATH, loading it (and building it first, if necessary) the first time it is
+    needed.
+    """
+    global _leave_table
+    if _leave_table is None:
+        if not os.path.exists(LEAVES_PATH):
+            LeaveTable.build().save(LEAVES_PATH)
+        _leave_table = LeaveTable.open(LEAVES_PATH)
+    return _leave_table
+
+
+if __name__ == '__main__':
+    # Build step: write the estimated leave values
+    LeaveTable.build().save(LEAVES_PATH)
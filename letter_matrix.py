@@ -0,0 +1,107 @@
+import numpy as np
+from board import *
+
+# Number of racks compared against the dictionary at once, which bounds the size of the temporary arrays
+CHUNK_SIZE = 64
+
+
+class LetterMatrix:
+    """
+    Dictionary as an N x 26 matrix of letter counts (one row per word, shortest words first), so that finding the words
+    formable from many racks is a few vectorized operations over the whole dictionary instead of a Python loop over
+    words.
+
+    A word can be formed from a rack if the letters it needs beyond those in the rack can be covered by blanks. The
+    letters a word shares with a rack are the sum, over the letters in the rack, of min(count in word, count in rack).
+    Those minimums are precomputed for every letter and every possible count, so for each rack the number of shared
+    letters is the sum of one precomputed row per distinct letter in the rack.
+    """
+    def __init__(self, words):
+        self.words = sorted(words, key=len)
+        self.lengths = np.array([len(word) for word in self.words], dtype=np.uint8)
+        letters = np.frombuffer(''.join(self.words).encode('ascii'), dtype=np.uint8) - ord('a')
+        rows = np.repeat(np.arange(len(self.words)), self.lengths)
+        self.counts = np.zeros((len(self.words), 26), dtype=np.uint8)
+        np.add.at(self.counts, (rows, letters), 1)
+        # self._shared[letter, n, j] is the number of times word j could use letter if n of it were available
+        self._most = int(self.counts.max())
+        self._shared = np.stack([np.minimum(self.counts.T, n) for n in range(self._most + 1)], axis=1)
+
+    @staticmethod
+    def _rack_counts(racks, fixed):
+        """
+        Returns a len(racks) x 26 array of the letters available to each rack (including those in fixed) and an array
+        of the number of blanks (_) in each rack. Other characters (such as upper-case played blanks) are ignored.
+        """
+        available = np.zeros((len(racks), 26), dtype=np.uint8)
+        blanks = np.zeros(len(racks), dtype=np.uint8)
+        for i, rack in enumerate(racks):
+            for letter in rack + fixed:
+                if letter == '_':
+                    blanks[i] += 1
+                elif 'a' <= letter <= 'z':
+                    available[i, ord(letter) - ord('a')] += 1
+        return available, blanks
+
+    def _formable_chunks(self, racks, fixed):
+        """
+        Yields (start, end, chunk), where chunk is a boolean array whose entry [i, j] is true if self.words[j] can be
+        formed from racks[start + i]. Words beyond the last column of chunk are too long for any of the racks.
+        """
+        available, blanks = self._rack_counts(racks, fixed)
+        # Words longer than every rack can be skipped
+        longest = int((available.sum(axis=1, dtype=np.uint16) + blanks).max())
+        n = np.searchsorted(self.lengths, longest, side='right')
+        # Each rack's distinct letters (padded with letters it has none of, which contribute nothing) and their counts
+        distinct = int(np.count_nonzero(available, axis=1).max())
+        letters = np.argsort(available == 0, axis=1, kind='stable')[:, :distinct]
+        amounts = np.minimum(np.take_along_axis(available, letters, axis=1), self._most)
+        shared = np.ascontiguousarray(self._shared[:, :, :n])  # Gathering rows from a strided view is much slower
+        for start in range(0, len(racks), CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, len(racks))
+            matched = shared[letters[start:end], amounts[start:end]].sum(axis=1, dtype=np.uint8)
+            yield start, end, self.lengths[np.newaxis, :n] - matched <= blanks[start:end, np.newaxis]
+
+    def formable(self, racks, fixed=''):
+        """
+        Returns a len(racks) x N boolean array whose entry [i, j] is true if self.words[j] can be formed from the
+        tiles in racks[i] plus the letters in fixed (e.g., tiles already on the board), where each _ is a blank that
+        can stand for any letter.
+        """
+        result = np.zeros((len(racks), len(self.words)), dtype=bool)
+        if racks:
+            for start, end, chunk in self._formable_chunks(racks, fixed):
+                result[start:end, :chunk.shape[1]] = chunk
+        return result
+
+    def count_formable(self, racks, fixed='', deadline=None):
+        """
+        Returns an array of the number of words formable from each rack (see formable). If deadline (a Deadline) is
+        given, stops once it passes, returning the counts for only the racks done by then, in order.
+        """
+        result = np.zeros(len(racks), dtype=np.int64)
+        if racks:
+            for start, end, chunk in self._formable_chunks(racks, fixed):
+                if deadline is not None and deadline.passed():
+                    return result[:start]
+                result[start:end] = chunk.sum(axis=1)
+        return result
+
+    def words_formable(self, rack, fixed=''):
+        """
+        Returns a list of the words formable from rack (see formable).
+        """
+        return [self.words[j] for j in np.flatnonzero(self.formable([rack], fixed)[0])]
+
+
+_letter_matrix = None
+
+
+def get_letter_matrix():
+    """
+    Returns the LetterMatrix for DICTIONARY, building it the first time it is needed.
+    """
+    global _letter_matrix
+    if _letter_matrix is None:
+        _letter_matrix = LetterMatrix(DICTIONARY)
+    return _letter_matrix
@@ -0,0 +1,253 @@
+from array import array
+import mmap
+import os
+
+# Symbols that can label an edge. The last one is only used by the GADDAG, to separate the reversed prefix of a word
+# from its suffix.
+SEPARATOR = '>'
+SYMBOLS = 'abcdefghijklmnopqrstuvwxyz' + SEPARATOR
+SEPARATOR_INDEX = 26
+LETTER_INDEX = {letter: i for i, letter in enumerate(SYMBOLS)}
+
+# Bit in a node's header indicating that a string ends at that node
+FINAL = 1 << 27
+
+# Bit mask with every letter (but not the separator) set
+ALL_LETTERS = (1 << 26) - 1
+
+
+def minimize(strings):
+    """
+    Builds the minimal automaton accepting strings, which must be sorted, using the incremental algorithm of Daciuk et
+    al. (2000). Returns the list of edge dicts (symbol -> node) and the list of final flags. The root is node 0.
+    """
+    edges = [{}]
+    final = [False]
+    register = {}
+    path = [0]  # Nodes along the most recently added string
+    previous = ''
+
+    def replace_or_register(depth):
+        # Nodes deeper than depth will never change again, so merge each with an equivalent registered node
+        while len(path) > depth + 1:
+            node = path.pop()
+            key = (final[node], tuple(edges[node].items()))
+            parent_edges = edges[path[-1]]
+            equivalent = register.setdefault(key, node)
+            if equivalent != node:
+                parent_edges[next(reversed(parent_edges))] = equivalent
+
+    for string in strings:
+        common = 0
+        limit = min(len(string), len(previous))
+        while common < limit and string[common] == previous[common]:
+            common += 1
+        replace_or_register(common)
+        node = path[-1]
+        for symbol in string[common:]:
+            edges.append({})
+            final.append(False)
+            child = len(edges) - 1
+            edges[node][symbol] = child
+            path.append(child)
+            node = child
+        final[node] = True
+        previous = string
+    replace_or_register(0)
+    return edges, final
+
+
+def pack(edges, final, count):
+    """
+    Returns the packed representation (see Automaton) of the automaton rooted at node 0, which accepts count strings.
+    """
+    data = array('I', [0, count])
+    offsets = {}
+    stack = [0]
+    while stack:  # Post-order traversal, so children are always written before their parents
+        node = stack[-1]
+        pending = [child for child in edges[node].values() if child not in offsets]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        if node in offsets:
+            continue  # Reached by more than one path
+        header = FINAL if final[node] else 0
+        for symbol in edges[node]:
+            header |= 1 << LETTER_INDEX[symbol]
+        offsets[node] = len(data)
+        data.append(header)
+        for symbol in sorted(edges[node], key=LETTER_INDEX.get):
+            data.append(offsets[edges[node][symbol]])
+    data[0] = offsets[0]
+    return data
+
+
+def write_atomically(path, data):
+    """
+    Writes data (bytes) to the file at path by way of a temporary file that then replaces it, so that a concurrent
+    reader never sees a partial file.
+    """
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+class Automaton:
+    """
+    Minimal acyclic automaton packed into a flat sequence of unsigned ints, which is also its file format.
+
+    Entry 0 holds the offset of the root and entry 1 the number of strings accepted. Each node is a header (one bit per
+    outgoing symbol, plus the FINAL bit) followed by the offsets of its children in symbol order. Since nodes start at
+    entry 2, 0 is used to mean "no such node".
+
+    A compiled file is memory-mapped and queried in place, so loading it is nearly instant and processes using the
+    same file share one copy in the page cache.
+    """
+    def __init__(self, data):
+        self._data = data
+        self.root = data[0]
+
+    @staticmethod
+    def strings(words):
+        """
+        Returns the strings to store for words. Subclasses override this to store something other than the words
+        themselves.
+        """
+        return words
+
+    @classmethod
+    def build(cls, words):
+        """
+        Returns a new automaton for words, built in memory.
+        """
+        strings = sorted(set(cls.strings(words)))
+        return cls(pack(*minimize(strings), len(strings)))
+
+    @classmethod
+    def compile(cls, source, target):
+        """
+        Builds an automaton for the words (one per line) in the file source and writes it to the file target.
+        """
+        with open(source) as file:
+            automaton = cls.build(line.strip() for line in file if line.strip())
+        write_atomically(target, automaton._data.tobytes())
+
+    @classmethod
+    def open(cls, path):
+        """
+        Returns the automaton stored in the file at path, memory-mapped rather than read.
+        """
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(memoryview(mapped).cast('I'))
+
+    @classmethod
+    def load(cls, source, target):
+        """
+        Returns the automaton compiled from source into target, compiling it first if target is missing or older
+        than source.
+        """
+        if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source):
+            cls.compile(source, target)
+        return cls.open(target)
+
+    def child(self, node, index):
+        """
+        Returns the child of node along the symbol with the given index, or 0 if there is no such child.
+        """
+        header = self._data[node]
+        bit = 1 << index
+        if not header & bit:
+            return 0
+        return self._data[node + 1 + (header & (bit - 1)).bit_count()]
+
+    def is_final(self, node):
+        """
+        Returns true if a string ends at node.
+        """
+        return bool(self._data[node] & FINAL)
+
+    def letters(self, node):
+        """
+        Returns the bit mask of letters (not including the separator) on edges leaving node.
+        """
+        return self._data[node] & ALL_LETTERS
+
+    def walk(self, string, node=None):
+        """
+        Returns the node reached by following string from node (by default, the root), or 0 if there is no such path.
+        """
+        if node is None:
+            node = self.root
+        for symbol in string:
+            index = LETTER_INDEX.get(symbol)
+            if index is None:
+                return 0
+            node = self.child(node, index)
+            if not node:
+                return 0
+        return node
+
+    def __len__(self):
+        return self._data[1]
+
+
+class Lexicon(Automaton):
+    """
+    Set of legal words stored as a DAWG. Supports the read-only parts of the set interface used on DICTIONARY.
+    """
+    def __init__(self, data):
+        super().__init__(data)
+        self._words = None
+
+    def __contains__(self, word):
+        if SEPARATOR in word:
+            return False
+        node = self.walk(word)
+        return bool(node) and self.is_final(node)
+
+    def cross_check(self, before, after):
+        """
+        Returns the bit mask of letters (bit 0 for a, bit 1 for b, etc.) that form a word when placed between before
+        and after.
+        """
+        node = self.walk(before)
+        if not node:
+            return 0
+        mask = 0
+        letters = self.letters(node)
+        while letters:
+            bit = letters & -letters
+            letters ^= bit
+            end = self.walk(after, self.child(node, bit.bit_length() - 1))
+            if end and self.is_final(end):
+                mask |= bit
+        return mask
+
+    def __iter__(self):
+        # The bots scan the whole dictionary repeatedly, so the words are only enumerated once
+        if self._words is None:
+            self._words = []
+            stack = [(self.root, '')]
+            while stack:
+                node, prefix = stack.pop()
+                if self.is_final(node):
+                    self._words.append(prefix)
+                mask = self.letters(node)
+                for i in reversed(range(26)):
+                    if mask & (1 << i):
+                        stack.append((self.child(node, i), prefix + SYMBOLS[i]))
+        return iter(self._words)
+
+
+if __name__ == '__main__':
+    # Build step: compile the word list into the files the game memory-maps
+    from board import WORDS_PATH, LEXICON_PATH
+    from gaddag import Gaddag, GADDAG_PATH
+    from anagram import AnagramIndex, ANAGRAMS_PATH
+    Lexicon.compile(WORDS_PATH, LEXICON_PATH)
+    Gaddag.compile(WORDS_PATH, GADDAG_PATH)
+    AnagramIndex.compile(WORDS_PATH, ANAGRAMS_PATH)
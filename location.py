@@ -1,4 +1,6 @@
 class Location:
+    __slots__ = ('r', 'c')
+
     def __init__(self, r, c):
         self.r = r
         self.c = c
@@ -12,9 +14,20 @@ class Location:
     def is_on_board(self):
         return 0 <= self.r < WIDTH and 0 <= self.c < WIDTH
 
+    def index(self):
+        """
+        Returns the flat index (see SQUARES) of this location, or OFF_BOARD if it is not on the board.
+        """
+        if self.is_on_board():
+            return self.r * WIDTH + self.c
+        return OFF_BOARD
+
     def __eq__(self, other):
         return self.r == other.r and self.c == other.c
 
+    def __hash__(self):
+        return hash((self.r, self.c))
+
     def __str__(self):
         return f'<{self.r}, {self.c}>'
 
@@ -43,3 +56,32 @@ VERTICAL = Location(1, 0)
 
 # Center of the board
 CENTER = Location(7, 7)
+
+
+# Code in inner loops refers to squares by flat index, r * WIDTH + c, rather than by Location, so that moving around
+# the board doesn't create objects. SQUARES holds one Location for each index, for when a Location is needed.
+SQUARES = [Location(i // WIDTH, i % WIDTH) for i in range(WIDTH * WIDTH)]
+
+# Index standing for every square off the edge of the board. Tables indexed by square have an extra entry for it.
+OFF_BOARD = WIDTH * WIDTH
+
+
+def axis(direction):
+    """
+    Returns the index of direction in tables with one entry per direction: 0 for HORIZONTAL, 1 for VERTICAL.
+    """
+    if direction == HORIZONTAL:
+        return 0
+    return 1
+
+
+def make_step_table(direction):
+    """
+    Returns a list giving, for each index (including OFF_BOARD), the index of the square one step away in direction.
+    """
+    return [(location + direction).index() for location in SQUARES] + [OFF_BOARD]
+
+
+# NEXT[axis(direction)][i] is the index of the square after square i in direction; PREVIOUS is the square before
+NEXT = [make_step_table(HORIZONTAL), make_step_table(VERTICAL)]
+PREVIOUS = [make_step_table(Location(0, -1)), make_step_table(Location(-1, 0))]
@@ -13,6 +13,12 @@ class ExchangeTiles:
         board.set_last_move(self)
         board.exchange(board.get_hand(player_number), self.tiles_to_exchange)
 
+    def apply(self, board, player_number):
+        """
+        Plays this move on board without checking its legality. Returns a Change that can be passed to board.undo.
+        """
+        return board.apply_exchange(board.get_hand(player_number), self.tiles_to_exchange)
+
 
 class PlayWord:
     """
@@ -28,3 +34,9 @@ class PlayWord:
         board.play(self._word, self._location, self._direction, board.get_hand(player_number))
         # These are returned for the benefit of the GUI
         return self._location, self._direction
+
+    def apply(self, board, player_number):
+        """
+        Plays this move on board without checking its legality. Returns a Change that can be passed to board.undo.
+        """
+        return board.apply_play(self._word, self._location, self._direction, board.get_hand(player_number))
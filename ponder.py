@@ -0,0 +1,153 @@
+import multiprocessing
+import random
+from gatekeeper import GateKeeper
+from deadline import Deadline
+
+# Most opponent hands sampled while pondering after each move
+MOST_PONDERED = 100
+
+# Default seconds the AI is given for each move it is asked for while pondering
+PONDER_TIME = 0.5
+
+
+def _key(gatekeeper):
+    """
+    Returns a key identifying the position the AI using gatekeeper sees.
+    """
+    return (gatekeeper.get_hash(), gatekeeper.get_my_score(), gatekeeper.get_opponent_score(),
+            gatekeeper.get_bag_count(), gatekeeper.get_opponent_hand_size(), type(gatekeeper.get_last_move()))
+
+
+def _sample_board(gatekeeper, unseen):
+    """
+    Returns a copy of the board seen through gatekeeper, with the opponent's hand and the bag sampled from unseen (a
+    str of the unseen tiles).
+    """
+    tiles = random.sample(unseen, len(unseen))
+    n = gatekeeper.get_opponent_hand_size()
+    return gatekeeper.get_hypothetical_board(tiles[:n], tiles[n:])
+
+
+class PonderingBot:
+    """
+    Wraps an AI so that it thinks on the opponent's time. After the AI moves, ponder starts a background process that,
+    for each of a series of hands sampled from the unseen tiles, guesses the opponent's reply by asking another
+    instance of the AI what it would play with that hand, and works out the AI's answer to the reply. If choose_move is
+    then called in one of these positions, the answer is returned at once, provided it was searched for at least as
+    long as choose_move's deadline allows; give the same budget as the real turns to make the most of pondering.
+
+    The process works on copies of the board, so the game goes on undisturbed, and it is stopped as soon as
+    choose_move is called, so it never competes with the AI's own search.
+    """
+    def __init__(self, make_bot, budget=PONDER_TIME):
+        """
+        :param make_bot: Called with no arguments to create each instance of the AI, such as the AI's class. It must be
+        picklable if processes are spawned rather than forked.
+        :param budget: Seconds spent pondering each move, passed to the AI's choose_move as a deadline. If None, its
+        choose_move is called without one.
+        """
+        self._make_bot = make_bot
+        self._bot = make_bot()
+        self._budget = budget
+        self._gatekeeper = None
+        self._process = None
+        self._connection = None  # End of the pipe the process sends (key, move) pairs through
+        self._answers = {}  # Move the AI would make, by position key (see _key)
+
+    def __str__(self):
+        return str(self._bot)
+
+    def set_gatekeeper(self, gatekeeper):
+        self._gatekeeper = gatekeeper
+        self._bot.set_gatekeeper(gatekeeper)
+
+    def choose_move(self, deadline=None):
+        """
+        Returns the move to make: the pondered answer if the opponent's reply was guessed and the answer was searched
+        for at least as long as deadline allows, or otherwise the AI's own choice (see the AI's choose_move).
+        """
+        self.stop_pondering()
+        move = self._answers.get(_key(self._gatekeeper))
+        # An answer found under a budget is only as good as the real search if it had at least as long
+        if self._budget is None or (deadline is not None and self._budget >= deadline.remaining()):
+            if move is not None:
+                return move
+        if deadline is None:
+            return self._bot.choose_move()
+        return self._bot.choose_move(deadline)
+
+    def ponder(self):
+        """
+        Starts pondering the position after the AI's move, on the opponent's turn. Pondering stops at the next call to
+        choose_move, or after MOST_PONDERED sampled hands.
+        """
+        self.stop_pondering()
+        self._answers = {}
+        unseen = self._gatekeeper.get_unseen_tiles()
+        board = _sample_board(self._gatekeeper, unseen)
+        self._connection, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_ponder,
+                                                args=(self._make_bot, self._budget, board, unseen, sender),
+                                                daemon=True)
+        self._process.start()
+        sender.close()
+
+    def close(self):
+        """
+        Stops pondering and closes the AI (see its close).
+        """
+        self.stop_pondering()
+        self._bot.close()
+
+    def stop_pondering(self):
+        """
+        Stops the pondering process, if any, keeping the answers it has sent.
+        """
+        if self._process is None:
+            return
+        try:
+            while self._connection.poll():
+                key, move = self._connection.recv()
+                self._answers[key] = move
+        except EOFError:
+            pass  # The process finished
+        self._process.terminate()
+        self._process.join()
+        self._connection.close()
+        self._process = None
+        self._connection = None
+
+
+def _ponder(make_bot, budget, board, unseen, connection):
+    """
+    Body of the pondering process. board is a copy of the position with the opponent to move, and unseen is a str of
+    the tiles the AI can't see.
+    """
+    random.seed()  # Otherwise a forked process would sample the same hands every time
+    bot = make_bot()
+
+    def ask(gatekeeper):
+        # Returns the move bot would make, seeing the board through gatekeeper
+        bot.set_gatekeeper(gatekeeper)
+        if budget is None:
+            return bot.choose_move()
+        return bot.choose_move(Deadline(budget))
+
+    player = 1 - board.get_current_player()
+    gatekeeper = GateKeeper(board, player)
+    pondered = set()
+    for _ in range(MOST_PONDERED):
+        position = _sample_board(gatekeeper, unseen)
+        reply = ask(GateKeeper(position, 1 - player))
+        try:
+            reply.play(position, 1 - player)
+        except ValueError:
+            continue  # Not every AI checks its own moves
+        if position.game_is_over():
+            continue
+        answering = GateKeeper(position, player)
+        key = _key(answering)
+        if key not in pondered:
+            pondered.add(key)
+            connection.send((key, ask(answering)))
+    connection.close()
@@ -0,0 +1,150 @@
+import multiprocessing
+import random
+from board import *
+from gatekeeper import GateKeeper
+from move import *
+from gaddag import MoveGenerator, start_worker, get_worker_generator
+from endgame import EndgameSolver
+from leave import hand_value
+from deadline import Deadline
+from exchange import count_outcomes, draw_outcomes, sample_outcomes
+
+# Most tiles in the bag for which PreEndgameSearch is used
+MOST_TILES = 6
+
+# Default number of highest-scoring plays compared
+CANDIDATES = 5
+
+# Most distinct bags that are all evaluated. Beyond this, bags are sampled.
+MOST_OUTCOMES = 20
+
+# Number of bags sampled when there are too many distinct bags to enumerate
+SAMPLES = 20
+
+# Default seconds spent on each endgame search within the pre-endgame
+ENDGAME_TIME = 0.05
+
+
+def evaluate(board, move, generator, solver, endgame_time=ENDGAME_TIME):
+    """
+    Returns the spread the player to move on board gains by making move (a PlayWord) and then playing out the game as
+    follows. If the bag is then empty, the opponent's reply is found by endgame search. Otherwise the opponent makes
+    its highest-scoring play (or passes), and if that empties the bag, the endgame is searched for our reply; if not,
+    the position is valued as if the game ended with neither player going out. board is changed.
+    """
+    player = board.get_current_player()
+    opponent = 1 - player
+    scores = board.get_scores()
+    before = scores[player] - scores[opponent]
+    move.apply(board, player)
+    if not board.game_is_over():
+        if not board.get_bag_count():
+            _, value = solver.solve(board, Deadline(endgame_time))
+            return scores[player] - scores[opponent] - before - value
+        replies = generator.generate(GateKeeper(board, opponent), board.get_hand(opponent), 1)
+        if replies:
+            PlayWord(*replies[0][1:]).apply(board, opponent)
+        else:
+            ExchangeTiles([False] * 7).apply(board, opponent)
+        if not board.game_is_over():
+            if not board.get_bag_count():
+                _, value = solver.solve(board, Deadline(endgame_time))
+                return scores[player] - scores[opponent] - before + value
+            return (scores[player] - scores[opponent] - before + hand_value(board.get_hand(opponent)) -
+                    hand_value(board.get_hand(player)))
+    return scores[player] - scores[opponent] - before
+
+
+class PreEndgameSearch:
+    """
+    Chooses a move when between one and MOST_TILES tiles remain in the bag. The AI knows which tiles are unseen but not
+    which of them are in the bag, so each of the candidates highest-scoring plays is evaluated (see evaluate) on a
+    board for every possible content of the bag, weighted by its probability, or for SAMPLES random ones if there are
+    more than MOST_OUTCOMES. The tiles in each bag are drawn in a single random order, so the expectation is only
+    over the contents of the bag, not the order they come out in. The play with the highest expected spread is chosen.
+
+    If processes is given, the evaluations are made by a pool of this many worker processes.
+    """
+    def __init__(self, generator=None, solver=None, processes=None, candidates=CANDIDATES,
+                 endgame_time=ENDGAME_TIME):
+        self._generator = generator if generator is not None else MoveGenerator()
+        self._solver = solver if solver is not None else EndgameSolver(self._generator)
+        self._processes = processes
+        self._pool = None
+        self._candidates = candidates
+        self._endgame_time = endgame_time
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any. The search can still be used; a new pool is started if needed.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _time_left(self, deadline):
+        """
+        Returns the seconds for an endgame search: endgame_time, or less if deadline (a Deadline) is sooner.
+        """
+        if deadline is None:
+            return self._endgame_time
+        return min(self._endgame_time, deadline.remaining())
+
+    def choose_move(self, gatekeeper, deadline=None):
+        """
+        Returns the best play (a PlayWord) for the AI using gatekeeper, or None if it has no play. If deadline (a
+        Deadline) is given, the search stops once it passes and the play with the best expectation over the bags every
+        candidate has been evaluated on is returned, or the highest-scoring play if there are none. The bags are
+        evaluated most likely first, and no endgame search runs past the deadline.
+        """
+        plays = self._generator.generate(gatekeeper, gatekeeper.get_hand(), self._candidates, deadline)
+        if not plays:
+            return None
+        moves = [PlayWord(word, location, direction) for _, word, location, direction in plays]
+        unseen = gatekeeper.get_unseen()
+        tiles = gatekeeper.get_unseen_tiles()
+        bag_count = gatekeeper.get_bag_count()
+        if count_outcomes(unseen, bag_count) <= MOST_OUTCOMES:
+            outcomes = draw_outcomes(unseen, bag_count)
+        else:
+            outcomes = sample_outcomes(unseen, bag_count, SAMPLES)
+        outcomes.sort(key=lambda outcome: outcome[1], reverse=True)
+        totals = [0.0] * len(moves)
+        if self._processes is not None and self._pool is None:
+            self._pool = multiprocessing.Pool(self._processes, initializer=start_worker)
+        # A batch of bags at a time, so that the deadline can be checked between batches
+        batch = 1 if self._processes is None else max(1, self._processes // len(moves))
+        for i in range(0, len(outcomes), batch):
+            tasks = []
+            for bag, _ in outcomes[i:i + batch]:
+                hand = list(tiles)
+                for tile in bag:
+                    hand.remove(tile)
+                bag = list(bag)
+                random.shuffle(bag)
+                for move in moves:
+                    tasks.append((gatekeeper.get_hypothetical_board(hand, bag), move))
+            if self._pool is None:
+                values = []
+                for board, move in tasks:
+                    if deadline is not None and deadline.passed():
+                        break
+                    values.append(evaluate(board, move, self._generator, self._solver, self._time_left(deadline)))
+            elif deadline is None or not deadline.passed():
+                values = self._pool.map(_evaluate_in_worker,
+                                        [(board, move, self._time_left(deadline)) for board, move in tasks])
+            else:
+                values = []
+            if len(values) < len(tasks):
+                break  # Out of time before every candidate was evaluated on these bags
+            for j, (_, probability) in enumerate(outcomes[i:i + batch]):
+                for k in range(len(moves)):
+                    totals[k] += probability * values[j * len(moves) + k]
+        return moves[max(range(len(moves)), key=lambda k: (totals[k], -k))]
+
+
+def _evaluate_in_worker(task):
+    board, move, endgame_time = task
+    generator = get_worker_generator()
+    return evaluate(board, move, generator, EndgameSolver(generator), endgame_time)
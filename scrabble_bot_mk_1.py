@@ -1,6 +1,9 @@
 from location import *
 from board import *
 from move import *
+from anagram import get_anagram_index
+from exchange import evaluate_exchanges
+from letter_matrix import get_letter_matrix
 import itertools
 
 ALL_TILES = [True] * 7
@@ -18,10 +21,18 @@ class ScrabbleBot:
         self._words = []
         self._blanks = ['-', '=', '+', '#', ' ']
         self._player_numbers = -1
+        self._anagrams = get_anagram_index()
+        get_letter_matrix()  # Built now rather than on the first exchange, which may have a deadline
+        self._deadline = None
 
     def __str__(self):
         return "Scrabble Bot Mk. 3"
 
+    def close(self):
+        """
+        Does nothing, as the bot uses no worker processes; it is here so that either bot can be closed when done with.
+        """
+
     def set_gatekeeper(self, gatekeeper):
         self._gatekeeper = gatekeeper
 
@@ -287,18 +298,11 @@ class ScrabbleBot:
             # Get playable words
         playable = self._get_all_words(usable)
         # Create blanks
-        for word in playable:
-            result = self._contains_letters(word, usable)
-            if result is not True:
-                temp = word.replace(result, result.upper(), 1)
-                playable.remove(word)
-                playable.append(temp)
-        for word in playable:
-            try:
-                self._gatekeeper.verify_legality(word, location, direction)
-                self._moves.append([self._gatekeeper.score(word, location, direction), word, location, direction])
-            except:
-                pass
+        playable = [version for word in playable for version in self._blank_versions(word, usable)]
+        candidates = [(word, location, direction) for word in playable]
+        for candidate, score in zip(candidates, self._gatekeeper.evaluate_all(candidates)):
+            if score >= 0:
+                self._moves.append([score, *candidate])
         return
 
     def _build_playable_word(self, word, s):
@@ -332,33 +336,41 @@ class ScrabbleBot:
                 return w
         return None
 
-    def _contains_letters_with_blanks(self, word, letters):
-        hand = letters
+    @staticmethod
+    def _blank_versions(word, letters):
+        """
+        Returns the versions of word that can be made from letters, where each _ is a blank: one for each choice of
+        which occurrences of the letters word needs beyond the other letters the blanks stand for (upper-cased).
+        """
+        available = letters.replace('_', '')
+        missing = {}
         for char in word:
-            if char not in hand:
-                if '_' in hand:
-                    hand = hand.replace('_', '', 1)
-                else:
-                    return False
+            if char in available:
+                available = available.replace(char, '', 1)
             else:
-                hand = hand.replace(char, '', 1)
-        return True
-
-    def _contains_letters(self, word, letters):
-        hand = letters
-        for char in word:
-            if char not in hand:
-                return char
-            hand = hand.replace(char, '', 1)
-        return True
+                missing[char] = missing.get(char, 0) + 1
+        if sum(missing.values()) > letters.count('_'):
+            return []
+        choices = [itertools.combinations([i for i, char in enumerate(word) if char == letter], n)
+                   for letter, n in missing.items()]
+        versions = []
+        for choice in itertools.product(*choices):
+            chars = list(word)
+            for positions in choice:
+                for i in positions:
+                    chars[i] = chars[i].upper()
+            versions.append(''.join(chars))
+        return versions
 
     def _get_all_words(self, letters):
-        return [word for word in DICTIONARY if self._contains_letters_with_blanks(word, letters)]
+        return self._anagrams.words(letters)
 
     def _vertical_check(self, hand):
         # Check vertical words
         direction = VERTICAL
         for col in range(15):
+            if self._out_of_time():
+                break
             placed = []
             last = 0
             for row in range(15):
@@ -379,13 +391,10 @@ class ScrabbleBot:
             # Get playable words
             playable = self._get_all_words(usable)
             # Create blanks
+            playable = [version for word in playable for version in self._blank_versions(word, usable)]
             for word in playable:
-                result = self._contains_letters(word, usable)
-                if result is not True:
-                    temp = word.replace(result, result.upper(), 1)
-                    playable.remove(word)
-                    playable.append(temp)
-            for word in playable:
+                if self._out_of_time():
+                    break
                 attempt = []
                 #  Check if word can be placed using board tiles
                 for s in combos:
@@ -400,20 +409,17 @@ class ScrabbleBot:
                 if len(h) == 7 - len(word) and word not in attempt:
                     attempt.append(word)
                 #  Try to place words
-                for row in range(15):
-                    location = Location(row, col)
-                    for w in attempt:
-                        try:
-                            self._gatekeeper.verify_legality(w, location, direction)
-                            self._moves.append(
-                                [self._gatekeeper.score(w, location, direction), w, location, direction])
-                        except:
-                            pass
+                candidates = [(w, Location(row, col), direction) for row in range(15) for w in attempt]
+                for candidate, score in zip(candidates, self._gatekeeper.evaluate_all(candidates)):
+                    if score >= 0:
+                        self._moves.append([score, *candidate])
 
     def _horizontal_check(self, hand):
         # Check vertical words
         direction = HORIZONTAL
         for row in range(15):
+            if self._out_of_time():
+                break
             placed = []
             last = 0
             for col in range(15):
@@ -434,14 +440,11 @@ class ScrabbleBot:
             # Get playable words
             playable = self._get_all_words(usable)
             # Create blanks
-            for word in playable:
-                result = self._contains_letters(word, usable)
-                if result is not True:
-                    temp = word.replace(result, result.upper(), 1)
-                    playable.remove(word)
-                    playable.append(temp)
+            playable = [version for word in playable for version in self._blank_versions(word, usable)]
             # Try to place words
             for word in playable:
+                if self._out_of_time():
+                    break
                 attempt = []
                 #  Check if word can be placed using board tiles
                 for s in combos:
@@ -456,21 +459,18 @@ class ScrabbleBot:
                 if len(h) == 7 - len(word) and word not in attempt:
                     attempt.append(word)
                 #  Try to place words
-                for col in range(15):
-                    location = Location(row, col)
-                    for w in attempt:
-                        try:
-                            self._gatekeeper.verify_legality(w, location, direction)
-                            self._moves.append(
-                                [self._gatekeeper.score(w, location, direction), w, location, direction])
-                        except:
-                            pass
+                candidates = [(w, Location(row, col), direction) for col in range(15) for w in attempt]
+                for candidate, score in zip(candidates, self._gatekeeper.evaluate_all(candidates)):
+                    if score >= 0:
+                        self._moves.append([score, *candidate])
 
     def _find_exchange_word(self, exchange):
         moves = []
         if not len(exchange):
             return None
         for option in exchange:
+            if self._deadline is not None and self._deadline.passed():
+                break
             hand = self._gatekeeper.get_hand()
             ex_hand = ''
             for i in range(len(hand)):
@@ -499,35 +499,9 @@ class ScrabbleBot:
         return None
 
     def _best_exchange(self):
-        # Possible exchange permutations
-        options = list(itertools.product([True, False], repeat=7))
-        options = [list(row) for row in options]
-
-        # Set up bag
-        self._bag = list(
-            'aaaaaaaaabbccddddeeeeeeeeeeeeffggghhiiiiiiiiijkllllmmnnnnnnooooooooppqrrrrrrssssttttttuuuuvvwwxyyz__')
-        for square in self._board:
-            if square not in self._blanks:
-                if 'A' <= square <= 'Z':
-                    self._bag.remove('_')
-                else:
-                    self._bag.remove(square)
-        temp_bag = self._bag.copy()
-
-        # Number of simulations
-        monty_carlo = 10
-        best = []
-        for option in options:
-            avg_words = 0
-            for i in range(monty_carlo):
-                self._bag = temp_bag.copy()
-                random.shuffle(self._bag)
-                hand = self._gatekeeper.get_hand()
-                self.exchange(hand, option)
-                hand = ''.join(hand)
-                avg_words += len(self._get_all_words(str(hand)))
-            avg_words /= monty_carlo
-            best.append([option, avg_words])
+        # Expected number of playable words after each distinct exchange, drawing from the tiles we can't see
+        best = evaluate_exchanges(self._gatekeeper.get_hand(), self._gatekeeper.get_unseen(),
+                                  self._gatekeeper.get_bag_count(), self._deadline)
         best = sorted(best, key=lambda x: x[1])
         return best[:5]
 
@@ -542,7 +516,18 @@ class ScrabbleBot:
             return True
         return False
 
-    def choose_move(self):
+    def _out_of_time(self):
+        """
+        Returns True if the deadline given to choose_move has passed and at least one move has been found.
+        """
+        return self._deadline is not None and bool(self._moves) and self._deadline.passed()
+
+    def choose_move(self, deadline=None):
+        """
+        Returns the move to make. If deadline (a Deadline) is given, the search for words stops once it
+        has passed and a move has been found, and the best move found by then is made.
+        """
+        self._deadline = deadline
         self._moves = []
         self._board = list(str(self._gatekeeper).replace('\n', ''))
         if self._check_pass_win():
@@ -5,8 +5,11 @@ from gatekeeper import GateKeeper
 from incrementalist import Incrementalist
 from location import *
 from board import *
+from move import *
 from enum import Enum
 from scrabble_bot_mk_1 import ScrabbleBot
+from ponder import PonderingBot
+from ai_turn import AITurn
 
 
 def rgb_to_hex(r, g, b):
@@ -37,6 +40,15 @@ color_tiles()
 
 SQUARE_WIDTH = 30
 
+# Seconds the AI has for each move, unless told to move now
+AI_TIME = 10.0
+
+# Milliseconds between checks on whether the AI has moved
+POLL_INTERVAL = 100
+
+# Number of characters in the bar showing how much of its time the AI has used
+PROGRESS_WIDTH = 20
+
 class Mode(Enum):
     BOARD = 0,  # Waiting for user to play a word on the board
     HAND = 1,  # Waiting for user to select tiles (if any) to exchange
@@ -48,7 +60,7 @@ class Scrabble:
     def __init__(self):
         self.board = Board()
         self.mode = Mode.AI_PLAYING
-        self.ai = ScrabbleBot()
+        self.ai = PonderingBot(ScrabbleBot, AI_TIME)
         self.ai.set_gatekeeper(GateKeeper(self.board, 0))
         self.created = [[False for _ in range(WIDTH)] for _ in range(WIDTH)]
         self.cursor_position = CENTER
@@ -56,6 +68,7 @@ class Scrabble:
         self.word_being_constructed = ''
         self.hand_cursor = 0
         self.tiles_to_discard = [False] * 7
+        self.ai_turn = None
         self.root = Tk()
         self.root.title('Scrabble')
         self.root['bg'] = TABLE_COLOR
@@ -82,9 +95,14 @@ class Scrabble:
         self.root.bind('<Down>', lambda e: self._handle_key_press('<Down>'))
         self.root.bind('<BackSpace>', lambda e: self._handle_key_press('<BackSpace>'))
         self.root.bind('<Return>', lambda e: self._handle_key_press('<Return>'))
+        self.root.bind('<Escape>', lambda e: self._handle_key_press('<Escape>'))
         self.root.bind('<Control_L>', lambda e: self._handle_key_press('<Control>'))
         self.root.bind('<Control_R>', lambda e: self._handle_key_press('<Control>'))
         self.root.mainloop()
+        # The window has been closed
+        if self.ai_turn is not None:
+            self.ai_turn.cancel()
+        self.ai.close()
 
     def _create_squares(self):
         grid = [[None for _ in range(WIDTH)] for _ in range(WIDTH)]
@@ -174,10 +192,10 @@ class Scrabble:
             # Play word
             elif key == '<Return>':
                 try:
-                    self.board.play(self.word_being_constructed,
-                                    self.cursor_position,
-                                    self.cursor_direction,
-                                    self.board.get_hand(1))
+                    # Played as a move so that the AI sees it as the last move
+                    PlayWord(self.word_being_constructed,
+                             self.cursor_position,
+                             self.cursor_direction).play(self.board, 1)
                     if self.board.game_is_over():
                         self.mode = Mode.GAME_OVER
                     else:
@@ -202,7 +220,7 @@ class Scrabble:
             elif key == ' ':
                 self.tiles_to_discard[self.hand_cursor] = not self.tiles_to_discard[self.hand_cursor]
             elif key == '<Return>':
-                self.board.exchange(self.board.get_hand(1), self.tiles_to_discard)
+                ExchangeTiles(self.tiles_to_discard).play(self.board, 1)
                 if self.board.game_is_over():
                     self.mode = Mode.GAME_OVER
                 else:
@@ -210,6 +228,11 @@ class Scrabble:
         elif self.mode == Mode.ILLEGAL_MOVE:
             if key == '<Return>':
                 self._enter_board_mode()
+        elif self.mode == Mode.AI_PLAYING:
+            if key == '<Return>':
+                self.ai_turn.move_now()
+            elif key == '<Escape>':
+                self.ai_turn.cancel()
         self._update()
 
     def _update(self):
@@ -258,7 +281,11 @@ class Scrabble:
         elif self.mode == Mode.GAME_OVER:
             self.instructions.configure(text='Game over.')
         elif self.mode == Mode.AI_PLAYING:
-            self.instructions.configure(text='Opponent thinking...')
+            filled = round(self.ai_turn.get_progress() * PROGRESS_WIDTH)
+            self.instructions.configure(text=f'Opponent thinking... {self.ai_turn.get_elapsed():.1f} s\n\n'
+                                        f'[{"#" * filled}{"-" * (PROGRESS_WIDTH - filled)}]\n\n'
+                                        'Enter to make it move now.\n\n'
+                                        'Escape to make it pass.')
 
     def _update_tile(self, hand, i):
         letter_text = self.user_letters[i]
@@ -284,14 +311,27 @@ class Scrabble:
 
     def _play_ai_move(self):
         self.mode = Mode.AI_PLAYING
+        # Think in the background so the window keeps responding
+        self.ai_turn = AITurn(self.ai, AI_TIME)
         self._update()
-        move = self.ai.choose_move()
+        self.root.after(POLL_INTERVAL, self._finish_ai_move)
+
+    def _finish_ai_move(self):
+        if not self.ai_turn.is_done():
+            self._update()  # Show progress
+            self.root.after(POLL_INTERVAL, self._finish_ai_move)
+            return
+        if self.ai_turn.cancelled:
+            move = ExchangeTiles([False] * 7)
+        else:
+            move = self.ai_turn.get_move()
         place = move.play(self.board, 0)
         if place:
             self.cursor_position, self.cursor_direction = place
         if self.board.game_is_over():
             self.mode = Mode.GAME_OVER
         else:
+            self.ai.ponder()  # Think while the user chooses a move
             self._enter_board_mode()
         self._update()
 
@@ -0,0 +1,178 @@
+from array import array
+import multiprocessing
+import random
+import signal
+import struct
+import sys
+from board import *
+from gatekeeper import GateKeeper
+from move import *
+from gaddag import MoveGenerator, start_worker, get_worker_generator
+from leave import *
+
+# Each record is a leave's key and the points the player who kept it scored on their next move
+RECORD = struct.Struct('<IH')
+
+# Number of records read from a file at a time when fitting
+RECORDS_PER_CHUNK = 1 << 16
+
+# Number of observations a leave needs before its fitted value counts as much as its estimate
+PRIOR_WEIGHT = 20
+
+# Chance that a self-play move is chosen at random from the best few, so that more varied leaves are seen
+EXPLORATION = 0.1
+EXPLORED_MOVES = 5
+
+# Default file that self-play records are appended to
+RECORDS_PATH = os.path.join(current_dir, 'selfplay.records')
+
+
+def choose_move(gatekeeper, generator, table):
+    """
+    Returns a move for the player seeing the board through gatekeeper, and the tiles it keeps. Moves are ranked by
+    equity (score plus the value of the tiles kept), with an exchange worth just the value of the tiles kept.
+    """
+    hand = gatekeeper.get_hand()
+    candidates = []
+    for score, word, location, direction in generator.generate(gatekeeper, hand):
+        kept = kept_tiles(word, hand)
+        candidates.append((score + table.value(kept), PlayWord(word, location, direction), kept))
+    if gatekeeper.get_bag_count() >= 7:
+        tiles_to_exchange, value = table.rank_exchanges(hand)[0]
+        kept = [tile for i, tile in enumerate(hand) if not tiles_to_exchange[i]]
+        candidates.append((value, ExchangeTiles(tiles_to_exchange), kept))
+    if not candidates:
+        return ExchangeTiles([False] * 7), hand
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    if random.random() < EXPLORATION:
+        _, move, kept = random.choice(candidates[:EXPLORED_MOVES])
+    else:
+        _, move, kept = candidates[0]
+    return move, kept
+
+
+def play_game(generator, table):
+    """
+    Plays a game in which both players use choose_move. Returns the bytes of a RECORD for every leave kept while tiles
+    remained in the bag and followed by another move before the game ended.
+    """
+    board = Board()
+    gatekeepers = [GateKeeper(board, 0), GateKeeper(board, 1)]
+    pending = [None, None]  # Key of the leave each player kept on their last move, if it is to be recorded
+    result = bytearray()
+    player = 0
+    while not board.game_is_over():
+        before = board.get_scores()[player]
+        move, kept = choose_move(gatekeepers[player], generator, table)
+        move.play(board, player)
+        if pending[player] is not None and not board.game_is_over():
+            result += RECORD.pack(pending[player], board.get_scores()[player] - before)
+        pending[player] = leave_key(kept) if board.get_bag_count() else None
+        player = 1 - player
+    return bytes(result)
+
+
+def _start_worker():
+    random.seed()  # Otherwise workers forked from the same parent would play the same games
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Interrupting a run is handled by the parent
+    start_worker()
+
+
+def _play_game_in_worker(_):
+    return play_game(get_worker_generator(), get_leave_table())
+
+
+def run(path=RECORDS_PATH, games=None, processes=None):
+    """
+    Plays games in a pool of processes (by default, one per CPU), appending their records to the file at path, until
+    the given number of games have been played or the run is interrupted. Records already in the file are kept, so an
+    interrupted run can simply be started again.
+    """
+    if os.path.exists(path):
+        # Drop any partial record left by a run that was killed mid-write
+        os.truncate(path, os.path.getsize(path) // RECORD.size * RECORD.size)
+    if processes is None:
+        processes = os.cpu_count()
+    played = 0
+    with multiprocessing.Pool(processes, initializer=_start_worker) as pool, open(path, 'ab') as file:
+        try:
+            while games is None or played < games:
+                # A bounded batch at a time, since the pool would consume an endless iterable all at once
+                batch = 4 * processes if games is None else min(4 * processes, games - played)
+                for records in pool.imap_unordered(_play_game_in_worker, range(batch)):
+                    file.write(records)
+                    file.flush()
+                    played += 1
+                print(f'{played} games played')
+        except KeyboardInterrupt:
+            pass
+    return played
+
+
+class LeaveStatistics:
+    """
+    Running count and total of the points scored after each leave, in arrays parallel to the keys of a LeaveTable, so
+    memory use doesn't grow with the number of records.
+    """
+    def __init__(self, table):
+        """
+        :param table: Table giving the leaves and, for leaves seen too rarely to fit, the values to fall back on.
+        """
+        self._table = table
+        self._counts = array('I', [0]) * len(table)
+        self._sums = array('d', [0.0]) * len(table)
+        self._count = 0
+        self._sum = 0.0
+
+    def add(self, key, points):
+        """
+        Adds one observation of points scored after the leave with the given key. Raises KeyError if the table has no
+        such leave.
+        """
+        i = self._table.find(key)
+        if i < 0:
+            raise KeyError(key)
+        self._counts[i] += 1
+        self._sums[i] += points
+        self._count += 1
+        self._sum += points
+
+    def read(self, path):
+        """
+        Adds every record in the file at path, reading it a chunk at a time.
+        """
+        with open(path, 'rb') as file:
+            while True:
+                chunk = file.read(RECORD.size * RECORDS_PER_CHUNK)
+                chunk = chunk[:len(chunk) // RECORD.size * RECORD.size]
+                if not chunk:
+                    return
+                for key, points in RECORD.iter_unpack(chunk):
+                    self.add(key, points)
+
+    def fit(self):
+        """
+        Returns a LeaveTable giving each leave the average points scored after it minus the average after any leave,
+        shrunk toward the fallback value by PRIOR_WEIGHT imaginary observations.
+        """
+        mean = self._sum / self._count if self._count else 0.0
+        values = array('f', self._table.values)
+        for i, count in enumerate(self._counts):
+            if count:
+                values[i] = (self._sums[i] - count * mean + PRIOR_WEIGHT * values[i]) / (count + PRIOR_WEIGHT)
+        return LeaveTable(self._table.keys, values)
+
+
+def fit(path=RECORDS_PATH):
+    """
+    Fits leave values to the records in the file at path, falling back on estimate_leave, and saves them to LEAVES_PATH.
+    """
+    statistics = LeaveStatistics(LeaveTable.build())
+    statistics.read(path)
+    statistics.fit().save(LEAVES_PATH)
+
+
+if __name__ == '__main__':
+    # Play the given number of games (or until interrupted), then refit the leave values to every record so far
+    run(games=int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    fit()
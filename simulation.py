@@ -0,0 +1,167 @@
+import math
+import multiprocessing
+import random
+from board import *
+from gatekeeper import GateKeeper
+from move import *
+from gaddag import MoveGenerator, start_worker, get_worker_generator
+from leave import get_leave_table, hand_value, kept_tiles
+from deadline import Deadline
+
+# Default number of plays, best by equity, that are simulated
+CANDIDATES = 8
+
+# Default number of moves played out after each candidate, alternating between the opponent and the AI
+PLIES = 2
+
+# Default total number of rollouts (one candidate played out on one sampled board) per move
+ROLLOUTS = 240
+
+
+class Simulator:
+    """
+    Chooses a play by Monte Carlo simulation. The candidates plays with the highest equity (score plus the value of the
+    tiles kept) are each played out plies moves further on boards where the opponent's hand and the bag are sampled
+    from the unseen tiles, both players greedily making their highest-scoring play (or passing). A rollout is valued
+    by the spread gained plus the value of the tiles each player kept on their last play while tiles remained in the
+    bag, or by the tiles left in hands once it is empty.
+
+    Every remaining candidate is played out on the same sampled boards, undoing each rollout so that the board's cross
+    checks and anchors (and the generator's cache) are shared across them. The rollouts are split into rounds of
+    successive halving: after each round, the worse half of the remaining candidates are dropped, so more rollouts go
+    to the close calls.
+
+    If processes is given, the sampled boards are played out by a pool of this many worker processes.
+    """
+    def __init__(self, generator=None, table=None, processes=None, candidates=CANDIDATES, plies=PLIES,
+                 rollouts=ROLLOUTS):
+        self._generator = generator if generator is not None else MoveGenerator()
+        self._table = table if table is not None else get_leave_table()
+        self._processes = processes
+        self._pool = None
+        self._candidates = candidates
+        self._plies = plies
+        self._rollouts = rollouts
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any. The simulator can still be used; a new pool is started if needed.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def choose_move(self, gatekeeper, deadline=None):
+        """
+        Returns the best play (a PlayWord) for the AI using gatekeeper, or None if it has no play. If deadline (a
+        Deadline) is given, simulation stops once it passes, even partway through a rollout, and the remaining
+        candidate with the best average is returned, or the one with the highest equity if none has been played out.
+        """
+        hand = gatekeeper.get_hand()
+        plays = []
+        for score, word, location, direction in self._generator.generate(gatekeeper, hand, deadline=deadline):
+            plays.append((score + self._table.value(kept_tiles(word, hand)), (word, location, direction)))
+        if not plays:
+            return None
+        plays.sort(key=lambda play: play[0], reverse=True)
+        candidates = [move for _, move in plays[:self._candidates]]
+        if len(candidates) == 1:
+            return PlayWord(*candidates[0])
+        unseen = gatekeeper.get_unseen_tiles()
+        opponent_hand_size = gatekeeper.get_opponent_hand_size()
+        totals = [0.0] * len(candidates)
+        counts = [0] * len(candidates)
+        remaining = list(range(len(candidates)))
+        rounds = max(1, math.ceil(math.log2(len(candidates))))
+        if self._processes is not None and self._pool is None:
+            self._pool = multiprocessing.Pool(self._processes, initializer=start_worker)
+        # A batch of boards at a time, so that the deadline can be checked between batches
+        batch = 1 if self._processes is None else self._processes
+        out_of_time = False
+        while len(remaining) > 1:
+            samples = max(1, self._rollouts // rounds // len(remaining))
+            for i in range(0, samples, batch):
+                if deadline is not None and deadline.passed():
+                    out_of_time = True
+                    break
+                tasks = []
+                for _ in range(min(batch, samples - i)):
+                    tiles = random.sample(unseen, len(unseen))
+                    board = gatekeeper.get_hypothetical_board(tiles[:opponent_hand_size], tiles[opponent_hand_size:])
+                    tasks.append((board, [candidates[j] for j in remaining], self._plies))
+                if self._pool is None:
+                    results = [play_out(board, moves, plies, self._generator, self._table, deadline)
+                               for board, moves, plies in tasks]
+                else:
+                    seconds = None if deadline is None else deadline.remaining()
+                    results = self._pool.map(_play_out_in_worker, [task + (seconds,) for task in tasks])
+                for values in results:
+                    if len(values) < len(remaining):
+                        out_of_time = True  # Only the candidates played out before the deadline have values
+                    for j, value in zip(remaining, values):
+                        totals[j] += value
+                        counts[j] += 1
+                if out_of_time:
+                    break
+            if out_of_time:
+                break
+            remaining.sort(key=lambda j: totals[j] / counts[j] if counts[j] else float('-inf'), reverse=True)
+            remaining = remaining[:(len(remaining) + 1) // 2]
+        played = [j for j in remaining if counts[j]]
+        if not played:
+            return PlayWord(*candidates[0])
+        best = max(played, key=lambda j: (totals[j] / counts[j], -j))
+        return PlayWord(*candidates[best])
+
+
+def play_out(board, moves, plies, generator, table, deadline=None):
+    """
+    Returns a list of the values (see Simulator) of playing out each of moves (as (word, location, direction)) for the
+    player to move on board, followed by plies greedy moves. board is restored afterward. If deadline (a Deadline)
+    passes, the rollout under way is abandoned and only the values of the moves already played out are returned.
+    """
+    player = board.get_current_player()
+    scores = board.get_scores()
+    before = scores[player] - scores[1 - player]
+    result = []
+    for move in moves:
+        changes = []
+        kept = [None, None]  # Tiles each player kept on their last play while tiles remained in the bag
+        try:
+            play = move
+            for ply in range(plies + 1):
+                if board.game_is_over():
+                    break
+                mover = board.get_current_player()
+                hand = board.get_hand(mover)
+                if ply:
+                    replies = generator.generate(GateKeeper(board, mover), hand, 1, deadline)
+                    play = replies[0][1:] if replies else None
+                if play is None:
+                    changes.append(board.apply_exchange(hand, [False] * 7))
+                    continue
+                if board.get_bag_count():
+                    kept[mover] = kept_tiles(play[0], hand)
+                changes.append(board.apply_play(*play, hand))
+                if deadline is not None and deadline.passed():
+                    return result  # A reply found as the deadline passed may not have been the best
+            value = scores[player] - scores[1 - player] - before
+            if not board.game_is_over():
+                if board.get_bag_count():
+                    for mover, sign in (player, 1), (1 - player, -1):
+                        if kept[mover] is not None:
+                            value += sign * table.value(kept[mover])
+                else:
+                    value += hand_value(board.get_hand(1 - player)) - hand_value(board.get_hand(player))
+        finally:
+            for change in reversed(changes):
+                board.undo(change)
+        result.append(value)
+    return result
+
+
+def _play_out_in_worker(task):
+    board, moves, plies, seconds = task
+    deadline = None if seconds is None else Deadline(seconds)
+    return play_out(board, moves, plies, get_worker_generator(), get_leave_table(), deadline)
@@ -1,12 +1,18 @@
 from incrementalist import Incrementalist
 from board import Board
 from gatekeeper import GateKeeper
+from deadline import Deadline
 
 
 class ScrabbleTournament:
     """A tournament between AIs."""
-    def __init__(self, players):
+    def __init__(self, players, budgets=None):
+        """
+        :param budgets: If given, a list of the number of seconds each player may take per move (None for no limit),
+        parallel to players. A player given a budget must accept a deadline argument to choose_move.
+        """
         self._players = players
+        self._budgets = budgets if budgets is not None else [None] * len(players)
 
     def run(self):
         """
@@ -17,26 +23,27 @@ class ScrabbleTournament:
         for i in range(len(players)):
             for j in range(len(players)):
                 if i != j:
-                    i_won, j_won = self.play_game(players[i], players[j])
+                    i_won, j_won = self.play_game(players[i], players[j], self._budgets[i], self._budgets[j])
                     scores[i] += i_won
                     scores[j] += j_won
         for i, player in enumerate(players):
             print(f'{str(player)}: {scores[i]}')
 
     @staticmethod
-    def play_game(a, b):
+    def play_game(a, b, budget_a=None, budget_b=None):
         """
-        Plays a game between AIs a (going first) and b. Returns their tournament scores: (1, 0) if a wins, (0, 1) if
-        b wins, or (0.5, 0.5) in case of a tie.
+        Plays a game between AIs a (going first) and b, each limited to the given number of seconds per move if a
+        budget is given. Returns their tournament scores: (1, 0) if a wins, (0, 1) if b wins, or (0.5, 0.5) in case of
+        a tie.
         """
         print(f'{a} vs {b}:')
         board = Board()
         a.set_gatekeeper(GateKeeper(board, 0))
         b.set_gatekeeper(GateKeeper(board, 1))
         while not board.game_is_over():
-            ScrabbleTournament.play_move(board, a, 0)
+            ScrabbleTournament.play_move(board, a, 0, budget_a)
             if not board.game_is_over():
-                ScrabbleTournament.play_move(board, b, 1)
+                ScrabbleTournament.play_move(board, b, 1, budget_b)
         scores = board.get_scores()
         print(board)
         print(f'Final score: {a} {scores[0]}, {b} {scores[1]}\n')
@@ -47,11 +54,14 @@ class ScrabbleTournament:
         return 0.5, 0.5
 
     @staticmethod
-    def play_move(board, player, player_number):
+    def play_move(board, player, player_number, budget=None):
         """
-        Asks player for a move and plays it on board.
+        Asks player for a move, within budget seconds if a budget is given, and plays it on board.
         """
-        move = player.choose_move()
+        if budget is None:
+            move = player.choose_move()
+        else:
+            move = player.choose_move(deadline=Deadline(budget))
         move.play(board, player_number)
 
 import scrabble_bot_mk_2
@@ -61,4 +71,9 @@ import scrabble_bot_mk_1
 if __name__ == '__main__':
     players = [scrabble_bot_mk_2.ScrabbleBot(),
                scrabble_bot_mk_1.ScrabbleBot()]
-    ScrabbleTournament(players).run()
+    budgets = [1.0, 1.0]  # Seconds per move
+    try:
+        ScrabbleTournament(players, budgets).run()
+    finally:
+        for player in players:
+            player.close()
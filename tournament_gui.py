@@ -5,9 +5,12 @@ from gatekeeper import GateKeeper
 from incrementalist import Incrementalist
 from location import *
 from board import *
+from move import *
 from enum import Enum
 import scrabble_bot_mk_2
 import scrabble_bot_mk_1
+from ponder import PonderingBot
+from ai_turn import AITurn
 
 
 
@@ -39,6 +42,15 @@ color_tiles()
 
 SQUARE_WIDTH = 30
 
+# Seconds each AI has for a move, unless told to move now
+AI_TIME = 10.0
+
+# Milliseconds between checks on whether the AI has moved
+POLL_INTERVAL = 100
+
+# Number of characters in the bar showing how much of its time the AI has used
+PROGRESS_WIDTH = 20
+
 class Mode(Enum):
     BOARD = 0,  # Waiting for user to play a word on the board
     HAND = 1,  # Waiting for user to select tiles (if any) to exchange
@@ -64,6 +76,8 @@ class Scrabble:
         self.word_being_constructed = ''
         self.hand_cursor = 0
         self.tiles_to_discard = [False] * 7
+        self.ai_turn = None
+        self.ai_player = None  # Player number of the AI whose turn it is
         self.root = Tk()
         self.root.title('scrabble')
         self.root['bg'] = TABLE_COLOR
@@ -90,6 +104,7 @@ class Scrabble:
         self.root.bind('<Down>', lambda e: self._handle_key_press('<Down>'))
         self.root.bind('<BackSpace>', lambda e: self._handle_key_press('<BackSpace>'))
         self.root.bind('<Return>', lambda e: self._handle_key_press('<Return>'))
+        self.root.bind('<Escape>', lambda e: self._handle_key_press('<Escape>'))
         self.root.bind('<Control_L>', lambda e: self._handle_key_press('<Control>'))
         self.root.bind('<Control_R>', lambda e: self._handle_key_press('<Control>'))
         self.root.mainloop()
@@ -181,18 +196,10 @@ class Scrabble:
                 self.word_being_constructed = self.word_being_constructed[:-1]
             # Play word
             elif key == '<Return>':
-                try:
-                    if self.turn == 1:
-                        self._play_ai_2_move()
-                    else:
-                        self._play_ai_move()
-                    if self.board.game_is_over():
-                        self.mode = Mode.GAME_OVER
-                except ValueError as e:
-                    self.instructions.configure(text='Illegal move:\n\n' +
-                                                str(e) + '\n\n'
-                                                'Hit enter to continue')
-                    self.mode = Mode.ILLEGAL_MOVE
+                if self.turn == 1:
+                    self._play_ai_2_move()
+                else:
+                    self._play_ai_move()
             # Switch to hand mode
             elif key == '<Control>':
                 self.mode = Mode.HAND
@@ -208,7 +215,7 @@ class Scrabble:
             elif key == ' ':
                 self.tiles_to_discard[self.hand_cursor] = not self.tiles_to_discard[self.hand_cursor]
             elif key == '<Return>':
-                self.board.exchange(self.board.get_hand(1), self.tiles_to_discard)
+                ExchangeTiles(self.tiles_to_discard).play(self.board, 1)  # So that the AI sees it as the last move
                 if self.board.game_is_over():
                     self.mode = Mode.GAME_OVER
                 else:
@@ -216,6 +223,11 @@ class Scrabble:
         elif self.mode == Mode.ILLEGAL_MOVE:
             if key == '<Return>':
                 self._enter_board_mode()
+        elif self.mode == Mode.AI_PLAYING:
+            if key == '<Return>':
+                self.ai_turn.move_now()
+            elif key == '<Escape>':
+                self.ai_turn.cancel()
         self._update()
 
     def _update(self):
@@ -271,7 +283,12 @@ class Scrabble:
             self.instructions.configure(text='Game over.')
             self.counter += 1
         elif self.mode == Mode.AI_PLAYING:
-            self.instructions.configure(text='Opponent thinking...')
+            name = self.name_1 if self.ai_player == 0 else self.name_2
+            filled = round(self.ai_turn.get_progress() * PROGRESS_WIDTH)
+            self.instructions.configure(text=f'{name} thinking... {self.ai_turn.get_elapsed():.1f} s\n\n'
+                                        f'[{"#" * filled}{"-" * (PROGRESS_WIDTH - filled)}]\n\n'
+                                        'Enter to make it move now.\n\n'
+                                        'Escape to cancel its move.')
 
     def _update_tile(self, hand, i, is_user=True):
         if is_user:
@@ -304,30 +321,45 @@ class Scrabble:
             self.user_rack.itemconfig(self.user_tiles[i], fill=TILE_COLOR)
 
     def _play_ai_move(self):
-        self.mode = Mode.AI_PLAYING
-        self._update()
-        move = self.ai_1.choose_move()
-        place = move.play(self.board, 0)
-        if place:
-            self.cursor_position, self.cursor_direction = place
-        if self.board.game_is_over():
-            self.mode = Mode.GAME_OVER
-        else:
-            self.turn = 1
-            self._enter_board_mode()
-        self._update()
+        self._start_ai_move(self.ai_1, 0)
 
     def _play_ai_2_move(self):
+        self._start_ai_move(self.ai_2, 1)
+
+    def _start_ai_move(self, ai, player_number):
         self.mode = Mode.AI_PLAYING
+        # Think in the background so the window keeps responding
+        self.ai_turn = AITurn(ai, AI_TIME)
+        self.ai_player = player_number
         self._update()
-        move = self.ai_2.choose_move()
-        place = move.play(self.board, 1)
+        self.root.after(POLL_INTERVAL, self._finish_ai_move)
+
+    def _finish_ai_move(self):
+        if not self.ai_turn.is_done():
+            self._update()  # Show progress
+            self.root.after(POLL_INTERVAL, self._finish_ai_move)
+            return
+        if self.ai_turn.cancelled:
+            self._enter_board_mode()  # Hitting enter starts the same AI's move again
+            self._update()
+            return
+        try:
+            place = self.ai_turn.get_move().play(self.board, self.ai_player)
+        except ValueError as e:
+            self.instructions.configure(text='Illegal move:\n\n' +
+                                        str(e) + '\n\n'
+                                        'Hit enter to continue')
+            self.mode = Mode.ILLEGAL_MOVE
+            self._update()
+            return
         if place:
             self.cursor_position, self.cursor_direction = place
         if self.board.game_is_over():
             self.mode = Mode.GAME_OVER
         else:
-            self.turn = 2
+            self.turn = self.ai_player + 1
+            # Think while the other AI chooses a move
+            (self.ai_1 if self.ai_player == 0 else self.ai_2).ponder()
             self._enter_board_mode()
         self._update()
 
@@ -382,6 +414,10 @@ class ScrabbleTournament:
 
 
 if __name__ == '__main__':
-    players = [scrabble_bot_mk_1.ScrabbleBot(),
-               scrabble_bot_mk_2.ScrabbleBot()]
-    ScrabbleTournament(players).run()
\ No newline at end of file
+    players = [PonderingBot(scrabble_bot_mk_1.ScrabbleBot, AI_TIME),
+               PonderingBot(scrabble_bot_mk_2.ScrabbleBot, AI_TIME)]
+    try:
+        ScrabbleTournament(players).run()
+    finally:
+        for player in players:
+            player.close()
\ No newline at end of file